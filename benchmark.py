@@ -0,0 +1,921 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import shutil
+import argparse
+import tempfile
+import platform
+from types import SimpleNamespace, MethodType
+from collections import Counter
+from functools import partial
+from contextlib import redirect_stdout
+from datetime import datetime, timezone, timedelta
+
+# Offline benchmark for the hot paths in main.py. It drives the real view
+# callbacks, slash commands and the reconcile/ending path against:
+#   - fake Discord objects (every REST call sleeps --api-latency-ms),
+#   - mongomock, or a local mongod via --mongo-uri,
+#   - a local aiohttp stand-in for Random.org.
+# Results go to stdout (and --output) as one JSON document for regression
+# tracking. The run exits 1 if any scenario errored or failed one of its
+# CHECKS. mongomock is only needed here: pip install -r requirements-dev.txt
+# (mongomock 4.3 breaks on pymongo 4.9+, which is pinned there).
+#
+#   python benchmark.py --mongo-uri mongodb://localhost   # full load
+#   python benchmark.py                    # mongomock, smaller entrant counts
+#   python benchmark.py --quick            # scaled down smoke run
+#   python benchmark.py --scenarios enter_burst,mass_end
+
+BENCH_DIR = tempfile.mkdtemp(prefix="giveaway-bench-")
+LOG_CHANNEL_ID = 900000000000000000
+ENTROPY_PORT = int(os.environ.get("BENCH_ENTROPY_PORT", 8765))
+
+os.environ.setdefault("LOG_CHANNEL_ID", str(LOG_CHANNEL_ID))
+os.environ.setdefault("EXPORT_DIR", os.path.join(BENCH_DIR, "exports"))
+os.environ.setdefault("RANDOM_ORG_URL", f"http://127.0.0.1:{ENTROPY_PORT}/integers/")
+os.environ.setdefault("LIVE_COUNTER_INTERVAL", "1")
+
+import discord
+from aiohttp import web
+from pymongo import MongoClient
+
+import main
+
+API_LATENCY = 0.05
+GUILD_ID = 800000000000000000
+LEGACY_ROLES = [SimpleNamespace(id=700000000000000001, name="🏆 x3 Entries"), SimpleNamespace(id=700000000000000002, name="🏆 x2 Entries")]
+
+################################
+
+def summarize(values):
+    # milliseconds; exact percentiles over every sample
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "count": len(values),
+        "p50": round(pick(0.50) * 1000, 3),
+        "p99": round(pick(0.99) * 1000, 3),
+        "max": round(values[-1] * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3)
+    }
+
+def draw_checks(doc, entries):
+    # verify_draw only re-runs draw_winners, so it agrees with any bug in it;
+    # these hold for every recorded draw whatever draw_winners does
+    entrants = {uid for uid, _ in entries}
+    earlier = set()
+    checks = {"no_repeat_winners": True, "excluded_skipped": True, "past_winners_excluded": True, "winners_entered": True}
+    for draw in doc.get("draws", []):
+        winners, excluded = set(draw["winners"]), set(draw["excluded"])
+        checks["no_repeat_winners"] &= len(winners) == len(draw["winners"])
+        checks["excluded_skipped"] &= not winners & excluded
+        checks["past_winners_excluded"] &= earlier <= excluded
+        checks["winners_entered"] &= winners <= entrants
+        earlier |= winners
+    checks["draw_verified"] = main.verify_draw(doc, entries)
+    return checks
+
+class LagSampler:
+    # How late a short sleep wakes up; anything blocking the loop shows here
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def __enter__(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    def __exit__(self, *exc):
+        self.task.cancel()
+
+async def api_call():
+    await asyncio.sleep(API_LATENCY)
+
+################################
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content=None, embed=None):
+        self.channel = channel
+        self.id = message_id
+        self.content = content or ""
+        self.embeds = [embed] if embed else []
+        self.author = main.bot.user
+
+    async def edit(self, **kwargs):
+        await api_call()
+
+    async def delete(self):
+        await api_call()
+
+class FakeChannel:
+    ids = iter(range(10**17, 2 * 10**17))
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = []
+
+    async def send(self, content=None, embed=None, view=None):
+        await api_call()
+        msg = FakeMessage(self, next(self.ids), content, embed)
+        self.sent.append(msg)
+        del self.sent[:-10]
+        return msg
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+
+    async def delete_messages(self, messages):
+        await api_call()
+
+    async def history(self, limit=100):
+        for msg in reversed(self.sent[-limit:]):
+            yield msg
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def _respond(self):
+        # time to first response is what Discord's 3 second deadline measures
+        if self.interaction.responded_at is None:
+            self.interaction.responded_at = time.perf_counter()
+        await api_call()
+
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False):
+        await self._respond()
+        self.interaction.sent = FakeMessage(self.interaction.channel, self.interaction.id, content, embed)
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self._respond()
+
+    async def edit_message(self, embed=None, view=None):
+        await self._respond()
+
+class FakeFollowup:
+    async def send(self, content=None, embed=None, file=None, ephemeral=False):
+        await api_call()
+
+class FakeInteraction:
+    ids = iter(range(3 * 10**17, 4 * 10**17))
+
+    def __init__(self, user, channel, message=None):
+        self.id = next(self.ids)
+        self.user = user
+        self.guild = user.guild
+        self.guild_id = user.guild.id
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+        self.sent = None
+        self.responded_at = None
+
+    async def original_response(self):
+        return self.sent
+
+def fake_member(uid, guild, roles=(), admin=False):
+    return SimpleNamespace(
+        id=uid, name=f"user{uid}", mention=f"<@{uid}>", guild=guild, roles=list(roles),
+        guild_permissions=SimpleNamespace(manage_messages=admin)
+    )
+
+def giveaway_message(channel, gid):
+    embed = discord.Embed(title="Giveaway")
+    embed.set_footer(text=f"Giveaway ID: {gid}")
+    return FakeMessage(channel, next(FakeChannel.ids), embed=embed)
+
+async def click(view, custom_id, interaction):
+    # same dispatch path as a real button press on a persistent view
+    item = next(i for i in view.children if getattr(i, "custom_id", None) == custom_id)
+    start = time.perf_counter()
+    await item.callback(interaction)
+    done = time.perf_counter()
+    return (interaction.responded_at or done) - start, done - start
+
+################################
+
+class EntropyStub:
+    # Random.org stand-in; `failing` makes it answer 503 to trip the breaker
+    def __init__(self, port=ENTROPY_PORT):
+        self.port = port
+        self.calls = 0
+        self.failing = False
+        self.runner = None
+
+    async def handle(self, request):
+        self.calls += 1
+        await asyncio.sleep(API_LATENCY)
+        if self.failing:
+            return web.Response(status=503)
+        num = int(request.query["num"])
+        return web.Response(text="\n".join(str(main.secrets.randbelow(main.ENTROPY_MAX) + 1) for _ in range(num)))
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/integers/", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+    async def close(self):
+        await self.runner.cleanup()
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.guild = SimpleNamespace(id=GUILD_ID, roles=LEGACY_ROLES)
+        self.channels = {LOG_CHANNEL_ID: FakeChannel(LOG_CHANNEL_ID)}
+        self.admin = fake_member(1, self.guild, admin=True)
+        self.stub = EntropyStub()
+        self.live_view = main.GiveawayView(None)
+        self.ended_view = main.GiveawayEndedView(main.bot)
+        self.big_gid = None
+        self.big_expected = {}
+
+    def channel(self, channel_id):
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id)
+        return self.channels[channel_id]
+
+    async def start(self):
+        if self.args.mongo_uri:
+            db = MongoClient(self.args.mongo_uri)["GiveawayBench"]
+            db.client.drop_database("GiveawayBench")
+        else:
+            try:
+                import mongomock
+            except ImportError:
+                sys.exit("benchmark.py needs mongomock (pip install mongomock) or --mongo-uri for a local mongod")
+            db = mongomock.MongoClient()["GiveawayBench"]
+        self.db = db
+        main.store = main.GiveawayStore(db)
+        await main.store.ensure_indexes()
+
+        # audit lines still go through the logger, just not onto our stdout
+        main.logger.handlers = [logging.StreamHandler(open(os.devnull, "w"))]
+        main.bot.get_channel = self.channels.get
+        main.bot.get_partial_messageable = lambda channel_id, **_: self.channel(channel_id)
+
+        async def fetch_channel(channel_id):
+            await api_call()
+            return self.channel(channel_id)
+        main.bot.fetch_channel = fetch_channel
+
+        await self.stub.start()
+        main.entropy = main.RandomOrgEntropy()
+        await main.entropy.start()
+        main.dispatcher.start()
+        main.live_counter.start()
+        main.log_pipeline.start()
+        main.bot.scheduler.start()
+
+    async def close(self):
+        await main.entropy.close()
+        await self.stub.close()
+        main.store.executor.shutdown(wait=False)
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    async def create_giveaway(self, channel, hours=1.0, winners=1):
+        interaction = FakeInteraction(self.admin, channel)
+        await main.creategiveaway.callback(interaction, "Bench", "Benchmark giveaway", hours, "n", winners)
+        return str(interaction.id)
+
+    def entrant(self, uid):
+        roles = [LEGACY_ROLES[uid % 3]] if uid % 3 < 2 else []
+        return fake_member(uid, self.guild, roles)
+
+    def weight(self, uid):
+        return main.LEGACY_ROLE_WEIGHTS[LEGACY_ROLES[uid % 3].name] if uid % 3 < 2 else 1
+
+    async def audit(self, gid, expected):
+        # stored entrants and counters must be exactly what the clicks should
+        # have left behind ({user_id: weight}), and a draw over the expected
+        # entrants must verify against the stored ones
+        doc = await main.store.find_one({"_id": gid})
+        rows = await main.store.entrant_weights(gid, by_user=True)
+        seed = f"bench:{gid}"
+        winners = main.draw_winners(sorted(expected.items()), seed, 3) if expected else []
+        return {
+            "entry_count": doc["entry_count"] == len(expected),
+            "total_weight": doc["total_weight"] == sum(expected.values()),
+            "no_duplicates": len(rows) == len({uid for uid, _ in rows}),
+            "entrants": dict(rows) == expected,
+            **draw_checks({"draws": [{"seed": seed, "winners": winners, "excluded": []}]}, rows)
+        }
+
+    ################################
+
+    async def enter_burst(self, buffered=False):
+        # N distinct users click Enter spread evenly over the window, each
+        # clicking twice at once; counters must only rise once per user
+        n, seconds = self.args.entrants, self.args.window
+        if buffered:
+            main.entry_buffer = main.EntryBuffer(path=os.path.join(BENCH_DIR, "entry_journal.ndjson"))
+            await main.entry_buffer.start()
+        channel = self.channel(10)
+        gid = await self.create_giveaway(channel)
+        message = giveaway_message(channel, gid)
+        base = 10**15 + (n if buffered else 0)
+        results = []
+
+        async def one(uid):
+            results.append(await click(self.live_view, "enter_btn", FakeInteraction(self.entrant(uid), channel, message)))
+
+        with LagSampler() as lag:
+            start = time.perf_counter()
+            tasks = []
+            for i in range(n):
+                delay = start + i * seconds / n - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks += [asyncio.create_task(one(base + i)) for _ in range(2)]
+            await asyncio.gather(*tasks)
+            if buffered:
+                await main.entry_buffer.flush()
+            elapsed = time.perf_counter() - start
+
+        doc = await main.store.find_one({"_id": gid})
+        expected = {base + i: self.weight(base + i) for i in range(n)}
+        checks = await self.audit(gid, expected)
+        if buffered:
+            await main.entry_buffer.close()
+            main.entry_buffer = None
+        else:
+            self.big_gid, self.big_expected = gid, expected
+        return {
+            "ops": len(results),
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(results) / elapsed, 1),
+            "response_ms": summarize([r[0] for r in results]),
+            "handler_ms": summarize([r[1] for r in results]),
+            "loop_lag_ms": summarize(lag.samples),
+            "stored_entrants": doc["entry_count"],
+            "checks": checks,
+            "correct": all(checks.values()),
+            "live_counter_edits": main.live_counter.edits
+        }
+
+    async def enter_burst_buffered(self):
+        return await self.enter_burst(buffered=True)
+
+    async def end_buffered(self):
+        # entries acknowledged by the buffer must make the draw when ending
+        # starts long before the next timed flush, and the member set cached
+        # by those clicks must not accept anyone once ending has started
+        main.entry_buffer = main.EntryBuffer(path=os.path.join(BENCH_DIR, "end_journal.ndjson"), interval_ms=60000)
+        await main.entry_buffer.start()
+        channel = self.channel(11)
+        uids = [3 * 10**15 + i for i in range(50)]
+        try:
+            gid = await self.create_giveaway(channel, winners=3)
+            main.bot.scheduler.cancel(gid)
+            message = giveaway_message(channel, gid)
+            await asyncio.gather(*(click(self.live_view, "enter_btn", FakeInteraction(self.entrant(uid), channel, message)) for uid in uids))
+            buffered = main.entry_buffer.pending_count
+            # ending's first stage, then a click before it drains
+            await main.store.update_one({"_id": gid}, {"$set": {"end_stage": "deleted"}})
+            late = await main.entry_buffer.enter(gid, 4 * 10**15, 1)
+            await main.bot.end_giveaway(gid)
+        finally:
+            await main.entry_buffer.close()
+            main.entry_buffer = None
+
+        doc = await main.store.get_giveaway(gid)
+        entries = await main.store.entrant_weights(gid, by_user=True)
+        expected = {uid: self.weight(uid) for uid in uids}
+        checks = {
+            "all_buffered_in_draw": dict(entries) == expected,
+            "entry_count": doc.get("entry_count") == len(expected),
+            "winners_entered": len(doc.get("winners", [])) == 3 and set(doc["winners"]) <= expected.keys(),
+            "late_entry_refused": late == "missing",
+            "draw_verified": main.verify_draw(doc, entries)
+        }
+        return {
+            "ops": len(uids),
+            "buffered_at_end": buffered,
+            "checks": checks,
+            "correct": all(checks.values())
+        }
+
+    async def leave_burst(self):
+        # a quarter of the burst's entrants leave, all at once, each clicking
+        # Leave twice; counters must only drop once per user
+        gid = self.big_gid or await self.create_giveaway(self.channel(10))
+        expected = dict(self.big_expected) if self.big_gid else {}
+        channel = self.channel(10)
+        message = giveaway_message(channel, gid)
+        uids = [10**15 + i for i in range(0, self.args.entrants, 4)] * 2
+        with LagSampler() as lag:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(click(self.live_view, "leave_btn", FakeInteraction(self.entrant(uid), channel, message)) for uid in uids))
+            elapsed = time.perf_counter() - start
+        for uid in uids:
+            expected.pop(uid, None)
+        if self.big_gid:
+            self.big_expected = expected
+        checks = await self.audit(gid, expected)
+        return {
+            "ops": len(uids),
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(uids) / elapsed, 1),
+            "response_ms": summarize([r[0] for r in results]),
+            "handler_ms": summarize([r[1] for r in results]),
+            "loop_lag_ms": summarize(lag.samples),
+            "checks": checks,
+            "correct": all(checks.values())
+        }
+
+    async def view_list(self):
+        # concurrent View Entrants clicks on the big giveaway, then paging
+        gid = self.big_gid or await self.create_giveaway(self.channel(10))
+        channel = self.channel(10)
+        message = giveaway_message(channel, gid)
+        main.store.cache.evict(gid)
+        clicks = self.args.views
+        with LagSampler() as lag:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(click(self.live_view, "view_btn", FakeInteraction(self.entrant(i), channel, message)) for i in range(clicks)))
+            pager = main.EntrantsPageView(gid, "Current Entrants", "Total entrants")
+            await pager.render()
+            pages = []
+            for _ in range(20):
+                pages.append((await click(pager, pager.next_page.custom_id, FakeInteraction(self.admin, channel)))[1])
+            elapsed = time.perf_counter() - start
+        return {
+            "ops": clicks,
+            "seconds": round(elapsed, 3),
+            "response_ms": summarize([r[0] for r in results]),
+            "page_ms": summarize(pages),
+            "loop_lag_ms": summarize(lag.samples),
+            "cache": main.store.cache.stats()
+        }
+
+    async def mass_end(self):
+        # every giveaway is already due when check_giveaways runs
+        count, channels = self.args.giveaways, self.args.channels
+        now = datetime.now(timezone.utc) - timedelta(seconds=1)
+        gids = [f"bench-end-{i}" for i in range(count)]
+        for i, gid in enumerate(gids):
+            channel = self.channel(20 + i % channels)
+            await main.store.insert_one({
+                "_id": gid, "title": f"Bench {i}", "description": "Benchmark giveaway",
+                "channel_id": channel.id, "guild_id": GUILD_ID, "entry_count": 0, "total_weight": 0,
+                "winners_count": 1, "end_time": now, "is_final": False, "message_id": next(FakeChannel.ids)
+            })
+        await main.store.add_entrants({gid: {10**16 + j: 1 + j % 3 for j in range(self.args.entrants_per_giveaway)} for gid in gids})
+
+        finished = {}
+        worker = main.bot.pipeline.worker
+
+        async def timed_worker(gid):
+            await worker(gid)
+            finished[gid] = time.perf_counter()
+        main.bot.pipeline.worker = timed_worker
+
+        with LagSampler() as lag:
+            start = time.perf_counter()
+            await main.bot.check_giveaways()
+            while len(finished) < count and time.perf_counter() - start < self.args.timeout:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - start
+        main.bot.pipeline.worker = worker
+
+        archived = await main.store.run(main.store.archive.count_documents, {"_id": {"$in": gids}})
+        return {
+            "ops": count,
+            "channels": channels,
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(finished) / elapsed, 1),
+            "completion_ms": summarize([t - start for t in finished.values()]),
+            "loop_lag_ms": summarize(lag.samples),
+            "archived": archived,
+            "correct": archived == count,
+            "dispatcher": main.dispatcher.stats()
+        }
+
+    async def reroll(self):
+        # ends the big giveaway for real, then rerolls it; every reroll
+        # re-reads the archived entrant blob
+        gid = self.big_gid or await self.create_giveaway(self.channel(10))
+        channel = self.channel(10)
+        start = time.perf_counter()
+        await main.bot.end_giveaway(gid)
+        end_seconds = time.perf_counter() - start
+        doc = await main.store.get_giveaway(gid)
+
+        results = []
+        with LagSampler() as lag:
+            for _ in range(self.args.rerolls):
+                message = giveaway_message(channel, gid)
+                results.append(await click(self.ended_view, "reroll_btn", FakeInteraction(self.admin, channel, message)))
+            export_start = time.perf_counter()
+            path = await main.build_export(gid)
+            export_seconds = time.perf_counter() - export_start
+
+        doc = await main.store.get_giveaway(gid)
+        entries = await main.store.entrant_weights(gid, by_user=True)
+        # one draw at the end plus one per reroll, until everyone has won
+        checks = draw_checks(doc, entries)
+        checks["draws_recorded"] = len(doc.get("draws", [])) == min(1 + self.args.rerolls, len(entries))
+        return {
+            "ops": len(results),
+            "entrants": doc.get("entry_count"),
+            "end_seconds": round(end_seconds, 3),
+            "response_ms": summarize([r[0] for r in results]),
+            "handler_ms": summarize([r[1] for r in results]),
+            "export_seconds": round(export_seconds, 3),
+            "export_bytes": os.path.getsize(path),
+            "loop_lag_ms": summarize(lag.samples),
+            "archived": bool(doc.get("archived_at")),
+            "checks": checks,
+            "verified": all(checks.values())
+        }
+
+    async def loop_lag(self):
+        # The same burst of concurrent Enter clicks twice, with every Mongo
+        # call taking --db-latency-ms: once with pymongo called straight from
+        # the coroutines (how the bot worked before GiveawayStore) and once
+        # through the store's executor.
+        store = main.store
+        clicks, latency = self.args.lag_clicks, self.args.db_latency_ms / 1000
+        threaded_run = store.run
+
+        def slow(fn):
+            def call(*args, **kwargs):
+                time.sleep(latency)
+                return fn(*args, **kwargs)
+            call.__qualname__ = fn.__qualname__
+            return call
+
+        async def inline(self, fn, *args, **kwargs):
+            return slow(fn)(*args, **kwargs)
+
+        async def threaded(self, fn, *args, **kwargs):
+            return await threaded_run(slow(fn), *args, **kwargs)
+
+        report = {"clicks": clicks, "db_latency_ms": self.args.db_latency_ms}
+        for mode, run in (("before_inline", inline), ("after_executor", threaded)):
+            channel = self.channel(11)
+            gid = await self.create_giveaway(channel)
+            message = giveaway_message(channel, gid)
+            store.run = MethodType(run, store)
+            try:
+                with LagSampler() as lag:
+                    start = time.perf_counter()
+                    results = await asyncio.gather(*(click(self.live_view, "enter_btn", FakeInteraction(self.entrant(5 * 10**14 + i), channel, message)) for i in range(clicks)))
+                    elapsed = time.perf_counter() - start
+            finally:
+                del store.run
+            report[mode] = {
+                "seconds": round(elapsed, 3),
+                "response_ms": summarize([r[0] for r in results]),
+                "loop_lag_ms": summarize(lag.samples)
+            }
+        return report
+
+    async def draw(self):
+        # pure draw cost at --draw-entries entrants
+        n = self.args.draw_entries
+        entries = [(10**17 + i, 1 + i % 3) for i in range(n)]
+        seed = main.hashlib.sha256(b"bench").hexdigest()
+        start = time.perf_counter()
+        winners = main.draw_winners(entries, seed, 10)
+        draw_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        checks = draw_checks({"draws": [{"seed": seed, "winners": winners, "excluded": []}]}, entries)
+        verify_seconds = time.perf_counter() - start
+        checks["winner_count"] = len(winners) == min(10, n)
+
+        # a small weighted pool: first picks must land in proportion to the
+        # weights, and a draw of everyone must skip exactly the excluded
+        pool = [(1, 1), (2, 2), (3, 3), (4, 4)]
+        trials = 20000
+        picks = Counter(main.draw_winners(pool, f"freq:{i}", 1)[0] for i in range(trials))
+        checks["weighted_frequency"] = all(abs(picks[uid] / trials - weight / 10) < 0.02 for uid, weight in pool)
+        checks["exclusion"] = all(sorted(main.draw_winners(pool, f"excl:{i}", 4, [2, 4])) == [1, 3] for i in range(100))
+        return {
+            "entrants": n,
+            "winners": len(winners),
+            "draw_seconds": round(draw_seconds, 3),
+            "verify_seconds": round(verify_seconds, 3),
+            "first_pick_share": {uid: round(picks[uid] / trials, 4) for uid, _ in pool},
+            "checks": checks,
+            "verified": all(checks.values())
+        }
+
+    async def dispatcher(self):
+        # queueing overhead of a fresh dispatcher, per priority, with calls
+        # spread so no route (and not the global bucket) is rate limited
+        calls = self.args.dispatch_calls
+        dispatcher = main.OutboundDispatcher(global_rate=calls)
+        dispatcher.start()
+        routes = max(1, calls // 4)
+        latencies = {}
+
+        async def one(i):
+            priority = i % 5
+            start = time.perf_counter()
+            await dispatcher.send(f"send:{i % routes}", priority, api_call)
+            latencies.setdefault(priority, []).append(time.perf_counter() - start - API_LATENCY)
+
+        with LagSampler() as lag:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(calls)))
+            elapsed = time.perf_counter() - start
+
+        # one contended route: the queued calls must come out by priority
+        order = []
+
+        async def record(priority):
+            order.append(priority)
+
+        blocker = dispatcher.submit("send:contended", main.PRIORITY_LOG, api_call)
+        futures = [dispatcher.submit("send:contended", p, partial(record, p)) for p in (4, 3, 2, 1, 0)]
+        await asyncio.gather(blocker, *futures)
+        dispatcher.task.cancel()
+
+        # a drained global bucket: calls queued later on other routes still
+        # go first when their priority is higher
+        dispatcher = main.OutboundDispatcher(global_rate=10)
+        dispatcher.start()
+        global_order = []
+
+        async def record_global(priority):
+            global_order.append(priority)
+
+        low = [dispatcher.submit(f"send:low{i}", main.PRIORITY_LOG, partial(record_global, main.PRIORITY_LOG)) for i in range(20)]
+        await asyncio.sleep(0)
+        high = [dispatcher.submit(f"send:high{i}", main.PRIORITY_ANNOUNCE, partial(record_global, main.PRIORITY_ANNOUNCE)) for i in range(5)]
+        await asyncio.gather(*low, *high)
+        # each of those 25 routes spent one token; once refilled they go
+        await asyncio.sleep(main.ROUTE_PER / main.ROUTE_RATE + 0.5)
+        routes_left = len(dispatcher.buckets)
+        dispatcher.task.cancel()
+        return {
+            "ops": calls,
+            "routes": routes,
+            "seconds": round(elapsed, 3),
+            "throughput": round(calls / elapsed, 1),
+            "queue_ms_by_priority": {str(p): summarize(v) for p, v in sorted(latencies.items())},
+            "loop_lag_ms": summarize(lag.samples),
+            "priority_order_ok": order == sorted(order),
+            "cross_route_priority_ok": global_order[10:15] == [main.PRIORITY_ANNOUNCE] * 5,
+            "idle_buckets_dropped": routes_left == 0
+        }
+
+    async def entropy(self):
+        # buffered Random.org draws, then the same with the service down
+        count = self.args.seeds
+        calls_before = self.stub.calls
+        healthy = []
+        for i in range(count):
+            start = time.perf_counter()
+            await main.make_seed(f"bench-seed-{i}")
+            healthy.append(time.perf_counter() - start)
+        fetches = self.stub.calls - calls_before
+
+        self.stub.failing = True
+        main.entropy.buffer.clear()
+        outage, sources = [], []
+        for i in range(count):
+            start = time.perf_counter()
+            sources.append((await main.entropy.get())[1])
+            outage.append(time.perf_counter() - start)
+        self.stub.failing = False
+        status = main.entropy.status()
+        main.entropy.failures, main.entropy.open_until = 0, 0
+        return {
+            "ops": count * 2,
+            "healthy_ms": summarize(healthy),
+            "healthy_fetches": fetches,
+            "outage_ms": summarize(outage),
+            "outage_fallbacks": sources.count("secrets"),
+            "status_after_outage": status
+        }
+
+    async def leases(self):
+        # several bot processes racing to claim the same giveaways; each
+        # contender has its own store and client. mongomock's
+        # find_one_and_update is not atomic across threads, so there the
+        # contenders share one DB thread and only the lease rules are tested.
+        contenders, count = self.args.contenders, self.args.lease_giveaways
+        stores = []
+        for _ in range(contenders):
+            if self.args.mongo_uri:
+                stores.append(main.GiveawayStore(MongoClient(self.args.mongo_uri)["GiveawayBench"]))
+            else:
+                store = main.GiveawayStore(self.db, workers=1)
+                store.executor = stores[0].executor if stores else store.executor
+                stores.append(store)
+        gids = [f"bench-lease-{i}" for i in range(count)]
+        for gid in gids:
+            await main.store.insert_one({"_id": gid, "title": "Lease", "end_time": datetime.now(timezone.utc)})
+
+        start = time.perf_counter()
+        claims = await asyncio.gather(*(s.claim_giveaway(gid, f"process-{n}", 60) for gid in gids for n, s in enumerate(stores)))
+        elapsed = time.perf_counter() - start
+        winners = [sum(c is not None for c in claims[i * contenders:(i + 1) * contenders]) for i in range(count)]
+        for s in stores:
+            s.executor.shutdown(wait=False)
+        return {
+            "ops": len(claims),
+            "contenders": contenders,
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(claims) / elapsed, 1),
+            "exclusive": all(w == 1 for w in winners),
+            "atomicity": "mongod" if self.args.mongo_uri else "serialized"
+        }
+
+    async def takeover(self):
+        # ending under a short lease: a stage that outlives the lease keeps it
+        # renewed, and a process that dies mid-announce is taken over by
+        # another one once its lease runs out, without posting anything twice
+        lease_seconds, process_id = main.LEASE_SECONDS, main.PROCESS_ID
+        main.LEASE_SECONDS = 0.3
+        channel = self.channel(20)
+        send = channel.send
+
+        async def ended_giveaway():
+            gid = await self.create_giveaway(channel)
+            main.bot.scheduler.cancel(gid)
+            await main.store.add_entrants({gid: {uid: 1 for uid in range(1, 21)}})
+            return gid
+
+        def posted(gid, doc):
+            footer, pings = f"Giveaway ID: {gid}", " ".join(f"<@{uid}>" for uid in doc.get("winners", []))
+            return (
+                sum(any(e.footer.text == footer for e in m.embeds) for m in channel.sent),
+                sum(m.content == pings for m in channel.sent)
+            )
+
+        async def slow_send(*args, **kwargs):
+            await asyncio.sleep(1.0)
+            return await send(*args, **kwargs)
+
+        async def dying_send(*args, **kwargs):
+            msg = await send(*args, **kwargs)
+            if kwargs.get("embed") is not None:
+                raise ConnectionError("process died after posting the announcement")
+            return msg
+
+        try:
+            # a peer keeps trying to claim while every send takes 3x the lease
+            slow_gid = await ended_giveaway()
+            channel.send = slow_send
+            ending = asyncio.create_task(main.bot.end_giveaway(slow_gid))
+            while (await main.store.find_one({"_id": slow_gid}, {"lease_owner": 1})).get("lease_owner") != process_id:
+                await asyncio.sleep(0.01)
+            steals = 0
+            while not ending.done():
+                steals += await main.store.claim_giveaway(slow_gid, "peer", main.LEASE_SECONDS) is not None
+                await asyncio.sleep(0.05)
+            await ending
+            slow_doc = await main.store.get_giveaway(slow_gid)
+
+            # the owner dies right after the announcement went out
+            dead_gid = await ended_giveaway()
+            channel.send = dying_send
+            main.PROCESS_ID = "peer"
+            try:
+                await main.bot.end_giveaway(dead_gid)
+            except ConnectionError:
+                pass
+            main.PROCESS_ID = process_id
+            channel.send = send
+            await main.bot.end_giveaway(dead_gid)
+            held = not (await main.store.get_giveaway(dead_gid)).get("ended")
+            await asyncio.sleep(main.LEASE_SECONDS)
+            await main.bot.end_giveaway(dead_gid)
+            dead_doc = await main.store.get_giveaway(dead_gid)
+        finally:
+            channel.send = send
+            main.LEASE_SECONDS, main.PROCESS_ID = lease_seconds, process_id
+
+        slow_entries = await main.store.entrant_weights(slow_gid, by_user=True)
+        dead_entries = await main.store.entrant_weights(dead_gid, by_user=True)
+        return {
+            "lease_seconds": 0.3,
+            "steals_during_slow_stage": steals,
+            "slow_stage_posts": posted(slow_gid, slow_doc),
+            "lease_held_after_death": held,
+            "takeover_posts": posted(dead_gid, dead_doc),
+            "archived": bool(slow_doc.get("archived_at") and dead_doc.get("archived_at")),
+            "correct": steals == 0 and held and posted(slow_gid, slow_doc) == (1, 1) and posted(dead_gid, dead_doc) == (1, 1)
+                and main.verify_draw(slow_doc, slow_entries) and main.verify_draw(dead_doc, dead_entries)
+        }
+
+SCENARIOS = ["loop_lag", "enter_burst", "enter_burst_buffered", "end_buffered", "leave_burst", "view_list", "mass_end", "reroll", "draw", "dispatcher", "entropy", "leases", "takeover"]
+
+################################
+
+# Scenario sizes. "full" is the target load and needs --mongo-uri: mongomock
+# checks unique indexes by scanning the whole collection, so inserts get
+# quadratically slower and its profile keeps the entrant counts lower.
+PROFILES = {
+    "full": {
+        "entrants": 10000, "window": 60.0, "views": 200, "giveaways": 500, "channels": 100,
+        "entrants_per_giveaway": 20, "rerolls": 20, "draw_entries": 1000000,
+        "dispatch_calls": 2000, "seeds": 300, "contenders": 4, "lease_giveaways": 200,
+        "lag_clicks": 500, "db_latency_ms": 5.0
+    },
+    "mongomock": {
+        "entrants": 2000, "window": 60.0, "views": 200, "giveaways": 500, "channels": 100,
+        "entrants_per_giveaway": 2, "rerolls": 20, "draw_entries": 1000000,
+        "dispatch_calls": 2000, "seeds": 300, "contenders": 4, "lease_giveaways": 200,
+        "lag_clicks": 500, "db_latency_ms": 5.0
+    },
+    "quick": {
+        "entrants": 500, "window": 5.0, "views": 20, "giveaways": 50, "channels": 10,
+        "entrants_per_giveaway": 5, "rerolls": 5, "draw_entries": 100000,
+        "dispatch_calls": 200, "seeds": 50, "contenders": 4, "lease_giveaways": 20,
+        "lag_clicks": 100, "db_latency_ms": 5.0
+    }
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline giveaway bot benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--quick", action="store_true", help="scale every scenario down for a smoke run")
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of mongomock (database GiveawayBench is dropped)")
+    parser.add_argument("--api-latency-ms", type=float, default=50)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="also write the JSON report here")
+    for name, value in PROFILES["full"].items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), help=f"full profile: {value}")
+    args = parser.parse_args()
+    args.profile = "quick" if args.quick else "full" if args.mongo_uri else "mongomock"
+    for name, value in PROFILES[args.profile].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    return args
+
+# boolean results that must hold for the run to pass
+CHECKS = ("correct", "verified", "exclusive", "priority_order_ok", "cross_route_priority_ok", "idle_buckets_dropped")
+
+def failures(report):
+    failed = []
+    for name, result in report["scenarios"].items():
+        if "error" in result:
+            failed.append(f"{name}: {result['error']}")
+        failed += [f"{name}: {check} is false" for check in CHECKS if result.get(check) is False]
+    return failed
+
+async def run(args):
+    global API_LATENCY
+    API_LATENCY = args.api_latency_ms / 1000
+    harness = Harness(args)
+    await harness.start()
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "discord.py": discord.__version__,
+            "mongo": "mongod" if args.mongo_uri else "mongomock",
+            "api_latency_ms": args.api_latency_ms,
+            "profile": args.profile
+        },
+        "scenarios": {}
+    }
+    try:
+        for name in args.scenarios.split(","):
+            print(f"running {name}...", file=sys.stderr)
+            try:
+                report["scenarios"][name] = await getattr(harness, name)()
+            except Exception as e:
+                report["scenarios"][name] = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        await harness.close()
+    report["meta"]["mongo_op_p99_ms"] = {
+        op: round(main.metrics.quantile("mongo_op_seconds", 0.99, op=op) * 1000, 3)
+        for op in sorted({dict(k)["op"] for k in main.metrics.histograms.get("mongo_op_seconds", {})})
+    }
+    report["failures"] = failures(report)
+    return report
+
+if __name__ == "__main__":
+    args = parse_args()
+    # the bot's own prints go to stderr so stdout stays valid JSON
+    with redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if report["failures"]:
+        print("FAILED: " + "; ".join(report["failures"]), file=sys.stderr)
+        sys.exit(1)
@@ -1,23 +1,177 @@
 import discord
 import os
-import requests
 import asyncio
 import time
 import hashlib
 import secrets
+import heapq
+import itertools
+import json
+import csv
+import gzip
+import shutil
+import aiohttp
 import sys
+import socket
+import logging
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 from discord.ext import commands, tasks
 from discord import app_commands
-from pymongo import MongoClient
-from flask import Flask
-from threading import Thread
+from pymongo import MongoClient, InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from flask import Flask, Response
+from threading import Thread, Lock
+from collections import deque, OrderedDict
 from datetime import datetime, timezone, timedelta
 
+METRIC_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+class Metrics:
+    # Minimal Prometheus registry: labelled histograms and counters updated
+    # from the event loop, plus gauges read at scrape time. The lock is there
+    # because /metrics is served from the Flask thread.
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self.lock = Lock()
+        self.help = {}
+        self.histograms = {}
+        self.counters = {}
+        self.counter_fns = {}
+        self.gauges = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {}).get(key)
+            if series is None:
+                series = self.histograms[name][key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def counter(self, name, fn):
+        # a running total kept elsewhere, read at scrape time
+        self.counter_fns[name] = fn
+
+    def quantile(self, name, q, **labels):
+        # bucket upper bound containing the q-th observation, across all
+        # series matching `labels`
+        wanted = set(labels.items())
+        with self.lock:
+            matching = [v for k, v in self.histograms.get(name, {}).items() if wanted <= set(k)]
+            total = sum(v[2] for v in matching)
+            if not total:
+                return None
+            for i, bound in enumerate(self.buckets):
+                if sum(v[0][i] for v in matching) >= q * total:
+                    return bound
+        return float("inf")
+
+    def count(self, name, **labels):
+        wanted = set(labels.items())
+        with self.lock:
+            return sum(v for k, v in self.counters.get(name, {}).items() if wanted <= set(k))
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self.lock:
+            for name, series in self.histograms.items():
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, (counts, total, count) in series.items():
+                    for bound, c in zip(self.buckets, counts):
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {c}")
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {total}")
+                    lines.append(f"{name}_count{fmt(labels)} {count}")
+            for name, series in self.counters.items():
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{fmt(labels)} {value}")
+        for kind, fns in (("counter", self.counter_fns), ("gauge", self.gauges)):
+            for name, fn in fns.items():
+                try:
+                    value = fn()
+                except Exception:
+                    continue
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.describe("interaction_seconds", "Time spent handling a button or command")
+metrics.describe("mongo_op_seconds", "MongoDB operation latency by operation")
+metrics.describe("event_loop_lag_seconds", "Delay between a scheduled wake-up and the loop running it")
+metrics.describe("scheduler_lateness_seconds", "Time between a giveaway's end_time and its ending starting")
+metrics.describe("entropy_fetch_seconds", "Random.org bulk fetch latency")
+metrics.describe("entropy_draws_total", "Entropy values handed out by source")
+metrics.describe("startup_phase_seconds", "Duration of each startup phase")
+metrics.describe("process_rss_bytes", "Resident set size of the bot process")
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+metrics.gauge("process_rss_bytes", rss_bytes)
+
+def timed(name):
+    # Records how long a button/command callback takes, errors included
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe("interaction_seconds", time.perf_counter() - start, handler=name)
+        return wrapper
+    return decorator
+
+LOOP_LAG_INTERVAL = 0.5
+
+async def monitor_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        metrics.observe("event_loop_lag_seconds", max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
 app = Flask('')
 
 @app.route('/')
 def home():
     return "Bot is alive!"
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
     
 def run_web_server():
     port = int(os.environ.get("PORT", 8080))
@@ -30,9 +184,755 @@ def keep_alive():
 proxy_url = os.environ.get("PROXY_URL")
 
 MONGO_URI = os.environ.get("MONGO_URI")
-cluster = MongoClient(MONGO_URI)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+DB_WORKERS = int(os.environ.get("DB_WORKERS", 8))
+DB_TIMEOUT_MS = int(os.environ.get("DB_TIMEOUT_MS", 5000))
+# Bump whenever ensure_indexes() or migrate_legacy_entrants() changes; both
+# only run on boots where the stored version differs.
+SCHEMA_VERSION = 2
+# Largest compressed entrant blob kept inline in an archived giveaway; bigger
+# lists stay in the entrants collection (Mongo documents are capped at 16MB).
+ARCHIVE_MAX_BLOB = int(os.environ.get("ARCHIVE_MAX_BLOB", 15 * 1024 * 1024))
+ARCHIVE_CHUNK = 64 * 1024
+ARCHIVE_SWEEP_BATCH = int(os.environ.get("ARCHIVE_SWEEP_BATCH", 50))
+
+cluster = MongoClient(
+    MONGO_URI,
+    maxPoolSize=DB_POOL_SIZE,
+    serverSelectionTimeoutMS=DB_TIMEOUT_MS,
+    connectTimeoutMS=DB_TIMEOUT_MS,
+    socketTimeoutMS=DB_TIMEOUT_MS
+)
 db = cluster["GiveawayBot"]
-giveaways_col = db["active_giveaways"]
+
+#################################
+
+CACHE_MAX_GIVEAWAYS = int(os.environ.get("CACHE_MAX_GIVEAWAYS", 256))
+CACHE_MAX_ENTRANTS = int(os.environ.get("CACHE_MAX_ENTRANTS", 500000))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 300))
+CACHE_MAX_PAGES = int(os.environ.get("CACHE_MAX_PAGES", 64))
+
+class GiveawayCache:
+    # Only GiveawayStore writes here, after its own writes land. A read that
+    # began before the giveaway's last change (`since` < its version) isn't
+    # cached, so a slow read can't undo an eviction.
+    def __init__(self, max_giveaways=CACHE_MAX_GIVEAWAYS, max_entrants=CACHE_MAX_ENTRANTS, ttl=CACHE_TTL):
+        self.max_giveaways = max_giveaways
+        self.max_entrants = max_entrants
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.indexed = 0
+        self.message_gids = OrderedDict()
+        self.version = 0
+        self.changed = OrderedDict()
+        self.changed_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, gid):
+        entry = self.entries.get(gid)
+        if entry is None:
+            return None
+        if entry["expires"] < time.monotonic():
+            self.evict(gid)
+            return None
+        self.entries.move_to_end(gid)
+        return entry
+
+    def _lookup(self, gid, key):
+        entry = self._entry(gid)
+        if entry is None or entry[key] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[key]
+
+    def get(self, gid):
+        return self._lookup(gid, "doc")
+
+    def get_index(self, gid):
+        return self._lookup(gid, "index")
+
+    def _touch(self, gid):
+        self.version += 1
+        self.changed[gid] = self.version
+        self.changed.move_to_end(gid)
+        while len(self.changed) > self.max_giveaways * 4:
+            self.changed_floor = self.changed.popitem(last=False)[1]
+
+    def changed_since(self, gid, version):
+        return self.changed.get(gid, self.changed_floor) > version
+
+    def put(self, gid, doc=None, index=None, since=None):
+        if since is not None and self.changed_since(gid, since):
+            return
+        entry = self._entry(gid)
+        if entry is None:
+            entry = {"doc": None, "index": None, "pages": None, "expires": time.monotonic() + self.ttl}
+            self.entries[gid] = entry
+        if doc is not None:
+            entry["doc"] = doc
+        if index is not None and len(index) <= self.max_entrants:
+            if entry["index"] is not None:
+                self.indexed -= len(entry["index"])
+            entry["index"] = index
+            entry["pages"] = None
+            self.indexed += len(index)
+        while len(self.entries) > self.max_giveaways or self.indexed > self.max_entrants:
+            self.evict(next(iter(self.entries)))
+            self.evictions += 1
+
+    def evict(self, gid):
+        self._touch(gid)
+        entry = self.entries.pop(gid, None)
+        if entry and entry["index"] is not None:
+            self.indexed -= len(entry["index"])
+
+    def add_entrant(self, gid, uid, weight):
+        self._touch(gid)
+        entry = self.entries.get(gid)
+        if entry is None:
+            return
+        if entry["doc"] is not None:
+            entry["doc"]["entry_count"] = entry["doc"].get("entry_count", 0) + 1
+            entry["doc"]["total_weight"] = entry["doc"].get("total_weight", 0) + weight
+        entry["pages"] = None
+        if entry["index"] is not None and uid not in entry["index"]:
+            entry["index"][uid] = weight
+            self.indexed += 1
+
+    def remove_entrant(self, gid, uid, weight):
+        self._touch(gid)
+        entry = self.entries.get(gid)
+        if entry is None:
+            return
+        if entry["doc"] is not None:
+            entry["doc"]["entry_count"] = entry["doc"].get("entry_count", 0) - 1
+            entry["doc"]["total_weight"] = entry["doc"].get("total_weight", 0) - weight
+        entry["pages"] = None
+        if entry["index"] is not None and entry["index"].pop(uid, None) is not None:
+            self.indexed -= 1
+
+    # rendered entrant list pages, dropped whenever the entrants change
+    def get_page(self, gid, page):
+        entry = self._entry(gid)
+        return entry["pages"].get(page) if entry and entry["pages"] else None
+
+    def put_page(self, gid, page, text, since):
+        entry = self._entry(gid)
+        if entry is None or self.changed_since(gid, since):
+            return
+        if entry["pages"] is None or len(entry["pages"]) >= CACHE_MAX_PAGES:
+            entry["pages"] = {}
+        entry["pages"][page] = text
+
+    def remember_message(self, message_id, gid):
+        self.message_gids[message_id] = gid
+        if len(self.message_gids) > self.max_giveaways * 4:
+            self.message_gids.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "giveaways": len(self.entries),
+            "indexed_entrants": self.indexed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0
+        }
+
+def _blob_values(blob, start=0):
+    # The int64s packed in an archive blob from position `start` on, as arrays
+    # of at most ARCHIVE_CHUNK bytes, so a blob is never unpacked all at once
+    d = zlib.decompressobj()
+    data, skip, rest = blob, start * 8, b""
+    while not d.eof:
+        out = d.decompress(data, ARCHIVE_CHUNK)
+        data = d.unconsumed_tail
+        if not out and not data:
+            break
+        cut = min(skip, len(out))
+        skip -= cut
+        out = rest + out[cut:]
+        usable = len(out) - len(out) % 8
+        rest = out[usable:]
+        if usable:
+            values = array("q")
+            values.frombytes(out[:usable])
+            yield from values
+
+#################################
+
+class GiveawayStore:
+    # pymongo is blocking, so every call is handed to a dedicated thread pool
+    # and awaited from the event loop instead of running inside it.
+    def __init__(self, db, workers=DB_WORKERS):
+        self.db = db
+        self.giveaways = db["active_giveaways"]
+        self.entrants = db["giveaway_entrants"]
+        self.meta = db["meta"]
+        self.archive = db["archived_giveaways"]
+        self.guild_rules = db["guild_rules"]
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo")
+        self.cache = GiveawayCache()
+        self.loading = {}
+
+    async def run(self, fn, *args, **kwargs):
+        # op label: the collection method, or the store method a closure is in
+        op = fn.__qualname__.split(".<locals>")[0].split(".")[-1]
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+        finally:
+            metrics.observe("mongo_op_seconds", time.perf_counter() - start, op=op)
+
+    async def ping(self):
+        return await self.run(self.db.client.admin.command, "ping")
+
+    async def find_one(self, query, projection=None):
+        return await self.run(self.giveaways.find_one, query, projection)
+
+    async def find(self, query, projection=None, limit=0):
+        return await self.run(lambda: list(self.giveaways.find(query, projection).limit(limit)))
+
+    async def insert_one(self, doc):
+        res = await self.run(self.giveaways.insert_one, doc)
+        self.cache.put(doc["_id"], doc=doc, index={} if not doc.get("entry_count") else None)
+        return res
+
+    async def update_one(self, query, update):
+        res = await self.run(self.giveaways.update_one, query, update)
+        self.cache.evict(query.get("_id"))
+        return res
+
+    async def delete_one(self, query):
+        res = await self.run(self.giveaways.delete_one, query)
+        self.cache.evict(query.get("_id"))
+        return res
+
+    # Ending is guarded by a lease so that only one bot process works on a
+    # giveaway at a time. A claim succeeds when nobody holds an unexpired
+    # lease (or we already do); a crashed holder's lease simply runs out.
+    async def claim_giveaway(self, gid, owner, ttl):
+        now = datetime.now(timezone.utc)
+        doc = await self.run(
+            self.giveaways.find_one_and_update,
+            {"_id": gid, "ended": {"$ne": True}, "$or": [
+                {"lease_until": None},
+                {"lease_until": {"$lt": now}},
+                {"lease_owner": owner}
+            ]},
+            {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=ttl)}},
+            return_document=ReturnDocument.AFTER
+        )
+        self.cache.evict(gid)
+        return doc
+
+    async def renew_lease(self, gid, owner, ttl):
+        res = await self.run(
+            self.giveaways.update_one,
+            {"_id": gid, "lease_owner": owner},
+            {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=ttl)}}
+        )
+        return res.matched_count == 1
+
+    # returns the cached copy; callers must not mutate it
+    async def get_giveaway(self, gid):
+        doc = self.cache.get(gid)
+        if doc is None:
+            doc = await self._load_once("doc", gid, self._load_giveaway)
+        return doc
+
+    async def get_entrants(self, gid):
+        index = self.cache.get_index(gid)
+        if index is None:
+            index = await self._load_once("index", gid, self._load_entrants)
+        return index
+
+    # Concurrent misses for the same giveaway share one read. A read that
+    # started before the giveaway last changed isn't shared with later callers.
+    async def _load_once(self, kind, gid, load):
+        key = (kind, gid)
+        current = self.loading.get(key)
+        if current is None or self.cache.changed_since(gid, current[1]):
+            since = self.cache.version
+            current = self.loading[key] = (asyncio.create_task(load(gid, since)), since)
+            def done(_):
+                if self.loading.get(key) is current:
+                    del self.loading[key]
+            current[0].add_done_callback(done)
+        return await asyncio.shield(current[0])
+
+    async def _load_giveaway(self, gid, since):
+        doc = await self.run(self.giveaways.find_one, {"_id": gid})
+        if doc is None:
+            doc = await self.run(self.archive.find_one, {"_id": gid}, {"entrants_blob": 0})
+        if doc is not None:
+            self.cache.put(gid, doc=doc, since=since)
+        return doc
+
+    async def _load_entrants(self, gid, since):
+        index = dict(await self.entrant_weights(gid))
+        self.cache.put(gid, index=index, since=since)
+        return index
+
+    # Entrants live in their own collection, one document per user with a
+    # weight, unique on (giveaway_id, user_id). The giveaway document only
+    # carries the `entry_count` (unique users) and `total_weight` counters.
+    async def ensure_indexes(self):
+        def work():
+            # the 30 day TTLs predate archiving; ended giveaways now move to
+            # the archive instead of expiring
+            for col, name in ((self.giveaways, "end_time_1"), (self.entrants, "joined_at_1")):
+                if "expireAfterSeconds" in col.index_information().get(name, {}):
+                    col.drop_index(name)
+            self.giveaways.create_index("end_time")
+            self.entrants.create_index([("giveaway_id", 1), ("user_id", 1)], unique=True)
+            self.entrants.create_index([("giveaway_id", 1), ("_id", 1)])
+        await self.run(work)
+
+    async def get_meta(self, key):
+        doc = await self.run(self.meta.find_one, {"_id": key})
+        return doc["value"] if doc else None
+
+    async def set_meta(self, key, value):
+        await self.run(self.meta.update_one, {"_id": key}, {"$set": {"value": value, "updated_at": datetime.now(timezone.utc)}}, upsert=True)
+
+    async def warm_cache(self, limit=CACHE_MAX_GIVEAWAYS):
+        # Loads the open giveaways ending soonest into the cache, skipping any
+        # already cached, and returns every open giveaway for scheduling
+        def work():
+            return list(self.giveaways.find({"ended": {"$ne": True}}).sort("end_time", 1))
+        since = self.cache.version
+        docs = await self.run(work)
+        for doc in docs[:limit]:
+            if doc["_id"] not in self.cache.entries:
+                self.cache.put(doc["_id"], doc=doc, since=since)
+        return docs
+
+    async def add_entrants(self, batch):
+        # Entries still land at end_stage "deleted", since ending drains the
+        # buffer before it draws. Returns the rows actually added.
+        closed = set()
+        undrawn = {"ended": {"$ne": True}, "end_stage": {"$in": [None, "deleted"]}}
+        def work():
+            now = datetime.now(timezone.utc)
+            open_ids = {d["_id"] for d in self.giveaways.find({"_id": {"$in": list(batch)}, **undrawn}, {"_id": 1})}
+            closed.update(gid for gid in batch if gid not in open_ids)
+            rows = [(gid, uid, weight) for gid, entries in batch.items() if gid in open_ids for uid, weight in entries.items()]
+            if not rows:
+                return []
+            ops = [InsertOne({"giveaway_id": gid, "user_id": uid, "weight": weight, "joined_at": now}) for gid, uid, weight in rows]
+            failed = set()
+            try:
+                self.entrants.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                if any(err["code"] != 11000 for err in errors):
+                    raise
+                failed = {err["index"] for err in errors}
+
+            totals = {}
+            for i, (gid, uid, weight) in enumerate(rows):
+                if i not in failed:
+                    count = totals.setdefault(gid, [0, 0])
+                    count[0] += 1
+                    count[1] += weight
+            if totals:
+                self.giveaways.bulk_write([
+                    UpdateOne({"_id": gid, **undrawn}, {"$inc": {"entry_count": users, "total_weight": weight}})
+                    for gid, (users, weight) in totals.items()
+                ], ordered=False)
+            return [rows[i] for i in range(len(rows)) if i not in failed]
+        added = await self.run(work)
+        for gid in closed:
+            self.cache.evict(gid)
+        for gid, uid, weight in added:
+            self.cache.add_entrant(gid, uid, weight)
+        return added
+
+    async def open_entrant_ids(self, gid):
+        # None when the giveaway is gone or already ending
+        doc = await self.get_giveaway(gid)
+        if doc is None or doc.get("ended") or doc.get("end_stage"):
+            return None
+        return set(await self.get_entrants(gid))
+
+    # enter/leave decide their outcome from one conditional write (unique
+    # insert / find-and-delete), so concurrent clicks by one user can't both
+    # succeed. Repeat clicks on a cached giveaway never touch Mongo.
+    async def enter(self, gid, uid, weight):
+        doc = self.cache.get(gid)
+        if doc is not None and (doc.get("ended") or doc.get("end_stage")):
+            return "missing"
+        index = self.cache.get_index(gid)
+        if index is not None and uid in index:
+            return "already"
+
+        def work():
+            try:
+                self.entrants.insert_one({"giveaway_id": gid, "user_id": uid, "weight": weight, "joined_at": datetime.now(timezone.utc)})
+            except DuplicateKeyError:
+                return "already"
+            res = self.giveaways.update_one(
+                {"_id": gid, "ended": {"$ne": True}, "end_stage": None},
+                {"$inc": {"entry_count": 1, "total_weight": weight}}
+            )
+            if res.matched_count == 0:
+                self.entrants.delete_one({"giveaway_id": gid, "user_id": uid})
+                return "missing"
+            return "entered"
+        result = await self.run(work)
+        if result == "entered":
+            self.cache.add_entrant(gid, uid, weight)
+        elif result == "missing":
+            self.cache.evict(gid)
+        return result
+
+    # A leave is refused once ending has started: the guarded counter update
+    # goes first, so a drawn winner's row is never removed from under the draw.
+    async def leave(self, gid, uid):
+        doc = self.cache.get(gid)
+        if doc is not None and (doc.get("ended") or doc.get("end_stage")):
+            return "missing"
+
+        def work():
+            entry = self.entrants.find_one({"giveaway_id": gid, "user_id": uid}, {"weight": 1})
+            if entry is None:
+                if self.giveaways.find_one({"_id": gid, "ended": {"$ne": True}, "end_stage": None}, {"_id": 1}) is None:
+                    return "missing", 0
+                return "not_joined", 0
+            res = self.giveaways.update_one(
+                {"_id": gid, "ended": {"$ne": True}, "end_stage": None},
+                {"$inc": {"entry_count": -1, "total_weight": -entry["weight"]}}
+            )
+            if res.matched_count == 0:
+                return "missing", 0
+            if self.entrants.delete_one({"_id": entry["_id"]}).deleted_count == 0:
+                self.giveaways.update_one({"_id": gid}, {"$inc": {"entry_count": 1, "total_weight": entry["weight"]}})
+                return "not_joined", 0
+            return "left", entry["weight"]
+        result, weight = await self.run(work)
+        if result == "left":
+            self.cache.remove_entrant(gid, uid, weight)
+        elif result == "missing":
+            self.cache.evict(gid)
+        return result
+
+    async def entrant_page(self, gid, start, count):
+        # `count` rows from entry position `start`, without loading the rest
+        # of the list when the index isn't cached
+        index = self.cache.get_index(gid)
+        if index is not None:
+            return list(itertools.islice(index.items(), start, start + count))
+        live = self._known_live(gid)
+        def hot():
+            cursor = self.entrants.find({"giveaway_id": gid}, {"_id": 0, "user_id": 1, "weight": 1}).sort("_id", 1).skip(start).limit(count)
+            return [(e["user_id"], e["weight"]) for e in cursor]
+        return await self.run(self._read_entrants, gid, live, hot, lambda rows: list(itertools.islice(rows, start, start + count)))
+
+    async def entrant_weights(self, gid, by_user=False):
+        # [(user_id, weight), ...] in entry order, or by user ID for draws
+        live = self._known_live(gid)
+        def hot():
+            cursor = self.entrants.find({"giveaway_id": gid}, {"_id": 0, "user_id": 1, "weight": 1}).sort("user_id" if by_user else "_id", 1)
+            return [(e["user_id"], e["weight"]) for e in cursor]
+        return await self.run(self._read_entrants, gid, live, hot, sorted if by_user else list)
+
+    def _known_live(self, gid):
+        doc = self.cache.get(gid)
+        return doc is not None and "archived_at" not in doc
+
+    # A giveaway the cache knows is live reads the entrants collection first;
+    # the archive is only asked when that comes back empty (it may have been
+    # archived since) or when nothing is known about the giveaway.
+    def _read_entrants(self, gid, live, hot, from_archive):
+        rows = hot() if live else None
+        if rows:
+            return rows
+        archived = self._archived_rows(gid)
+        if archived is not None:
+            return from_archive(archived)
+        return rows if rows is not None else hot()
+
+    # The blob holds every user ID in entry order, then every weight; reading
+    # it twice side by side pairs them up without unpacking it all at once.
+    def _archived_rows(self, gid):
+        doc = self.archive.find_one({"_id": gid}, {"entrants_blob": 1, "entry_count": 1})
+        if doc is None or doc.get("entrants_blob") is None:
+            return None
+        count = doc["entry_count"]
+        ids = itertools.islice(_blob_values(doc["entrants_blob"]), count)
+        return zip(ids, _blob_values(doc["entrants_blob"], start=count))
+
+    # Writes to ended giveaways (rerolls) bump `revision`. The hot document is
+    # only deleted if its revision is still the one that was copied; otherwise
+    # a reroll landed in between and the newer document is copied again.
+    async def archive_giveaway(self, gid):
+        def work():
+            doc = self.giveaways.find_one({"_id": gid})
+            if doc is None or not doc.get("ended"):
+                return False
+            cursor = self.entrants.find({"giveaway_id": gid}, {"_id": 0, "user_id": 1, "weight": 1}).sort("_id", 1)
+            ids, weights = array("q"), array("q")
+            for e in cursor:
+                ids.append(e["user_id"])
+                weights.append(e["weight"])
+            blob = zlib.compress((ids + weights).tobytes())
+            inline = len(blob) <= ARCHIVE_MAX_BLOB
+            while True:
+                revision = doc.get("revision")
+                for key in ("lease_owner", "lease_until"):
+                    doc.pop(key, None)
+                doc.update({
+                    "archived_at": datetime.now(timezone.utc),
+                    "entry_count": len(ids),
+                    "total_weight": sum(weights),
+                    "entrants_blob": blob if inline else None
+                })
+                # archive first, so a crash in between leaves a copy in both
+                # places and the next sweep simply redoes it
+                self.archive.replace_one({"_id": gid}, doc, upsert=True)
+                if self.giveaways.delete_one({"_id": gid, "revision": revision}).deleted_count:
+                    break
+                doc = self.giveaways.find_one({"_id": gid})
+                if doc is None:
+                    return False
+            if inline:
+                self.entrants.delete_many({"giveaway_id": gid})
+            return True
+        archived = await self.run(work)
+        self.cache.evict(gid)
+        return archived
+
+    async def update_ended(self, gid, update):
+        # for writes to ended giveaways, wherever they currently live
+        update = {**update, "$inc": {**update.get("$inc", {}), "revision": 1}}
+        res = await self.run(self.giveaways.update_one, {"_id": gid}, update)
+        if not res.matched_count:
+            res = await self.run(self.archive.update_one, {"_id": gid}, update)
+        self.cache.evict(gid)
+        return res
+
+    async def get_guild_rules(self, guild_id):
+        return await self.run(self.guild_rules.find_one, {"_id": guild_id})
+
+    async def update_guild_rules(self, guild_id, update):
+        return await self.run(self.guild_rules.update_one, {"_id": guild_id}, update, upsert=True)
+
+    async def delete_archived(self, gid):
+        res = await self.run(self.archive.delete_one, {"_id": gid})
+        self.cache.evict(gid)
+        return res
+
+    async def export_entrants(self, gid, path, fmt="csv", batch_size=1000):
+        # Streams straight from the cursor into the file, so memory stays at
+        # one batch regardless of how many entrants there are.
+        def work():
+            tmp_path = f"{path}.tmp"
+            entries = self._archived_rows(gid)
+            if entries is None:
+                cursor = self.entrants.find(
+                    {"giveaway_id": gid}, {"_id": 0, "user_id": 1, "weight": 1}
+                ).sort("_id", 1).batch_size(batch_size)
+                entries = ((e["user_id"], e["weight"]) for e in cursor)
+            rows = 0
+            with open(tmp_path, "w", newline="") as f:
+                if fmt == "ndjson":
+                    for order, (uid, weight) in enumerate(entries, 1):
+                        f.write(json.dumps({"user_id": str(uid), "weight": weight, "entry_order": order}) + "\n")
+                        rows += 1
+                else:
+                    writer = csv.writer(f)
+                    writer.writerow(["user_id", "weight", "entry_order"])
+                    for order, (uid, weight) in enumerate(entries, 1):
+                        writer.writerow([uid, weight, order])
+                        rows += 1
+            os.replace(tmp_path, path)
+            return rows
+        return await self.run(work)
+
+    async def delete_entrants(self, gid):
+        res = await self.run(self.entrants.delete_many, {"giveaway_id": gid})
+        self.cache.evict(gid)
+        return res
+
+    async def migrate_legacy_entrants(self):
+        # Older documents kept entrants as one array with a user repeated once
+        # per multiplier. Safe to re-run: entrants already copied over are
+        # skipped by the unique index and the counters are recomputed.
+        def work():
+            migrated = 0
+            for g in self.giveaways.find({"entrants": {"$exists": True}}, {"entrants": 1}):
+                weights = {}
+                for uid in g["entrants"]:
+                    weights[uid] = weights.get(uid, 0) + 1
+                docs = [{"giveaway_id": g["_id"], "user_id": uid, "weight": weight, "joined_at": datetime.now(timezone.utc)} for uid, weight in weights.items()]
+                if docs:
+                    try:
+                        self.entrants.insert_many(docs, ordered=False)
+                    except BulkWriteError:
+                        pass
+                self.giveaways.update_one({"_id": g["_id"]}, {
+                    "$set": {"entry_count": len(weights), "total_weight": sum(weights.values())},
+                    "$unset": {"entrants": ""}
+                })
+                migrated += 1
+            return migrated
+        return await self.run(work)
+
+store = GiveawayStore(db)
+
+#################################
+
+ENTRY_BUFFER = os.environ.get("ENTRY_BUFFER", "n").lower() == "y"
+ENTRY_FLUSH_MS = int(os.environ.get("ENTRY_FLUSH_MS", 250))
+ENTRY_FLUSH_MAX = int(os.environ.get("ENTRY_FLUSH_MAX", 500))
+ENTRY_JOURNAL = os.environ.get("ENTRY_JOURNAL", "entry_journal.ndjson")
+ENTRY_JOURNAL_FSYNC = os.environ.get("ENTRY_JOURNAL_FSYNC", "y").lower() == "y"
+
+class EntryBuffer:
+    # The journal is rotated to `<journal>.flushing` and only removed once the
+    # bulk write succeeded, so start() can replay whatever a crash left behind.
+    # With ENTRY_JOURNAL_FSYNC=n an entry only survives a host crash once flushed.
+    def __init__(self, path=ENTRY_JOURNAL, interval_ms=ENTRY_FLUSH_MS, max_pending=ENTRY_FLUSH_MAX, max_members=CACHE_MAX_GIVEAWAYS, fsync=ENTRY_JOURNAL_FSYNC):
+        self.path = path
+        self.flushing_path = f"{path}.flushing"
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self.pending = {}
+        self.pending_count = 0
+        self.members = OrderedDict()
+        self.max_members = max_members
+        self.fsync = fsync
+        self.journal = None
+        self.flush_lock = asyncio.Lock()
+        self.flush_now = asyncio.Event()
+        self.task = None
+
+    async def start(self):
+        for path in (self.flushing_path, self.path):
+            if os.path.exists(path):
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            self._apply(json.loads(line))
+                        except ValueError:
+                            pass
+        if self.pending_count:
+            self.journal = open(self.path, "a")
+            print(f"Replaying {self.pending_count} journaled entries")
+            await self.flush()
+        else:
+            self.journal = open(self.path, "w")
+            if os.path.exists(self.flushing_path):
+                os.remove(self.flushing_path)
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        await self.flush()
+        self.journal.close()
+
+    def _apply(self, record):
+        entries = self.pending.setdefault(record["gid"], {})
+        if record["op"] == "enter":
+            if record["uid"] not in entries:
+                self.pending_count += 1
+            entries[record["uid"]] = record["weight"]
+        elif entries.pop(record["uid"], None) is not None:
+            self.pending_count -= 1
+
+    def _record(self, record):
+        self._apply(record)
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+        if self.fsync:
+            os.fsync(self.journal.fileno())
+
+    async def _members(self, gid):
+        if gid not in self.members:
+            ids = await store.open_entrant_ids(gid)
+            if ids is None:
+                return None
+            # entries still waiting for a flush are not in Mongo yet
+            ids.update(self.pending.get(gid, ()))
+            self.members.setdefault(gid, ids)
+            while len(self.members) > self.max_members:
+                self.members.popitem(last=False)
+        self.members.move_to_end(gid)
+        return self.members[gid]
+
+    async def enter(self, gid, uid, weight):
+        # a cached member set outlives the start of ending; the doc doesn't
+        doc = await store.get_giveaway(gid)
+        if doc is None or doc.get("ended") or doc.get("end_stage"):
+            self.members.pop(gid, None)
+            return "missing"
+        members = await self._members(gid)
+        if members is None:
+            return "missing"
+        if uid in members:
+            return "already"
+        members.add(uid)
+        self._record({"op": "enter", "gid": gid, "uid": uid, "weight": weight})
+        if self.pending_count >= self.max_pending:
+            self.flush_now.set()
+        return "entered"
+
+    async def leave(self, gid, uid):
+        if uid in self.pending.get(gid, {}):
+            self._record({"op": "leave", "gid": gid, "uid": uid})
+            self.members.get(gid, set()).discard(uid)
+            return "left"
+        # an entry may be mid-flush; let it land before deleting it
+        async with self.flush_lock:
+            result = await store.leave(gid, uid)
+        if result == "left" and gid in self.members:
+            self.members[gid].discard(uid)
+        return result
+
+    async def drain(self, gid):
+        # dropping the member set makes later clicks re-check the giveaway
+        self.members.pop(gid, None)
+        await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending_count:
+                return
+            batch, self.pending, self.pending_count = self.pending, {}, 0
+            self.journal.close()
+            os.replace(self.path, self.flushing_path)
+            self.journal = open(self.path, "a")
+            try:
+                await store.add_entrants(batch)
+            except Exception as e:
+                # keep the rotated journal; the entries go back in the queue
+                for gid, entries in batch.items():
+                    for uid, weight in entries.items():
+                        self._record({"op": "enter", "gid": gid, "uid": uid, "weight": weight})
+                print(f"Entry flush failed: {e}")
+                return
+            os.remove(self.flushing_path)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_now.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Entry flush error: {e}")
+
+entry_buffer = EntryBuffer() if ENTRY_BUFFER else None
 
 intents = discord.Intents.default()
 intents.members = True
@@ -40,39 +940,842 @@ intents.message_content = True
 
 #################################
 
-async def log_event(text: str):
-    LOG_CHANNEL_ID = int(os.environ.get("LOG_CHANNEL_ID"))
-    channel = bot.get_channel(LOG_CHANNEL_ID)
+PRIORITY_ANNOUNCE = 1
+PRIORITY_DELETE = 2
+PRIORITY_EDIT = 3
+PRIORITY_LOG = 4
+ROUTE_RATE = float(os.environ.get("ROUTE_RATE", 5))
+ROUTE_PER = float(os.environ.get("ROUTE_PER", 5))
+GLOBAL_RATE = float(os.environ.get("GLOBAL_RATE", 50))
+
+class TokenBucket:
+    def __init__(self, rate=ROUTE_RATE, per=ROUTE_PER):
+        self.capacity = rate
+        self.tokens = rate
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def delay(self):
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.fill_rate
+
+    def until_full(self):
+        self.refill()
+        return (self.capacity - self.tokens) / self.fill_rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class OutboundDispatcher:
+    # Each route ("send:<channel>", ...) runs one call at a time. The shared
+    # global bucket is handed out strictly by priority, so when it runs dry an
+    # announcement goes before a log line on any route. Interaction responses
+    # never queue: they use the interaction's own webhook.
+    def __init__(self, global_rate=GLOBAL_RATE):
+        self.heap = []
+        self.seq = itertools.count()
+        self.buckets = {}
+        self.global_bucket = TokenBucket(global_rate, 1)
+        self.busy = set()
+        self.tasks = set()
+        self.wake = asyncio.Event()
+        self.task = None
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def submit(self, route, priority, factory):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.heap, (priority, next(self.seq), route, factory, future))
+        self.wake.set()
+        return future
+
+    async def send(self, route, priority, factory):
+        return await self.submit(route, priority, factory)
+
+    def stats(self):
+        return {"queued": len(self.heap), "in_flight": len(self.busy), "routes": len(self.buckets), "completed": self.completed, "failed": self.failed}
+
+    async def _execute(self, route, factory, future):
+        try:
+            result = await factory()
+            if not future.done():
+                future.set_result(result)
+            self.completed += 1
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            self.failed += 1
+        finally:
+            self.busy.discard(route)
+            self.wake.set()
+
+    async def run(self):
+        while True:
+            self.wake.clear()
+            blocked, wait = [], None
+            while self.heap:
+                item = heapq.heappop(self.heap)
+                priority, _, route, factory, future = item
+                if future.cancelled():
+                    continue
+                if route in self.busy:
+                    blocked.append(item)
+                    continue
+                bucket = self.buckets.setdefault(route, TokenBucket())
+                delay = bucket.delay()
+                if delay:
+                    blocked.append(item)
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                delay = self.global_bucket.delay()
+                if delay:
+                    # nothing of lower priority may take the next global token
+                    blocked.append(item)
+                    wait = delay if wait is None else min(wait, delay)
+                    break
+                bucket.consume()
+                self.global_bucket.consume()
+                self.busy.add(route)
+                task = asyncio.create_task(self._execute(route, factory, future))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            for item in blocked:
+                heapq.heappush(self.heap, item)
+
+            # a full bucket is the same as a fresh one, so idle routes are
+            # dropped once they refill instead of piling up per channel
+            queued = {item[2] for item in self.heap}
+            for route, bucket in list(self.buckets.items()):
+                if route in self.busy or route in queued:
+                    continue
+                until = bucket.until_full()
+                if until <= 0:
+                    del self.buckets[route]
+                else:
+                    wait = until if wait is None else min(wait, until)
+
+            if wait is None:
+                await self.wake.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+dispatcher = OutboundDispatcher()
+
+async def purge(channel, messages):
+    # One bulk delete where Discord allows it, single deletes otherwise
+    messages = [m for m in messages if m is not None]
+    if not messages:
+        return
+
+    async def delete():
+        if len(messages) > 1:
+            try:
+                return await channel.delete_messages(messages)
+            except (discord.HTTPException, discord.ClientException):
+                pass
+        for m in messages:
+            try:
+                await m.delete()
+            except discord.NotFound:
+                pass
+    await dispatcher.send(f"delete:{channel.id}", PRIORITY_DELETE, delete)
+
+################################
+
+LIVE_COUNTER_INTERVAL = float(os.environ.get("LIVE_COUNTER_INTERVAL", 5))
+
+class LiveCounter:
+    # Enter/leave only mark the giveaway dirty; each channel gets at most one
+    # edit per LIVE_COUNTER_INTERVAL, showing the latest cached counters.
+    def __init__(self, interval=LIVE_COUNTER_INTERVAL):
+        self.interval = interval
+        self.dirty = {}
+        self.last_edit = {}
+        self.wake = asyncio.Event()
+        self.task = None
+        self.tasks = set()
+        self.edits = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def mark(self, gid, channel_id):
+        self.dirty.setdefault(channel_id, set()).add(gid)
+        self.wake.set()
+
+    async def _edit(self, channel_id, gid):
+        try:
+            await self._update(channel_id, gid)
+        except Exception as e:
+            print(f"Live counter edit failed: {e}")
+
+    async def _update(self, channel_id, gid):
+        doc = await store.get_giveaway(gid)
+        channel = bot.get_channel(channel_id)
+        if not doc or not channel or doc.get("end_stage") or doc.get("ended") or "description" not in doc:
+            return
+        entry_count = doc.get("entry_count", 0)
+        total_weight = doc.get("total_weight", 0)
+        if entry_buffer:
+            pending = entry_buffer.pending.get(gid, {})
+            entry_count += len(pending)
+            total_weight += sum(pending.values())
+
+        msg = channel.get_partial_message(doc["message_id"])
+        embed = build_giveaway_embed(doc, entry_count, total_weight)
+        await dispatcher.send(f"edit:{channel_id}", PRIORITY_EDIT, partial(msg.edit, embed=embed))
+        self.edits += 1
+
+    async def run(self):
+        while True:
+            self.wake.clear()
+            if not self.dirty:
+                # an edit older than the interval no longer delays anything
+                cutoff = time.monotonic() - self.interval
+                for channel_id in [c for c, t in self.last_edit.items() if t <= cutoff]:
+                    del self.last_edit[channel_id]
+                await self.wake.wait()
+                continue
+
+            now = time.monotonic()
+            next_due = None
+            for channel_id in list(self.dirty):
+                due = self.last_edit.get(channel_id, 0) + self.interval
+                if due > now:
+                    next_due = due if next_due is None else min(next_due, due)
+                    continue
+                gids = self.dirty[channel_id]
+                gid = gids.pop()
+                if not gids:
+                    del self.dirty[channel_id]
+                self.last_edit[channel_id] = now
+                task = asyncio.create_task(self._edit(channel_id, gid))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+            if next_due is not None:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=next_due - now)
+                except asyncio.TimeoutError:
+                    pass
+
+live_counter = LiveCounter()
 
-    if channel:
+################################
+
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 1000))
+LOG_FLUSH_MS = int(os.environ.get("LOG_FLUSH_MS", 2000))
+LOG_FILE = os.environ.get("LOG_FILE")
+
+logger = logging.getLogger("giveawaybot")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.StreamHandler(sys.stdout))
+if LOG_FILE:
+    logger.addHandler(logging.FileHandler(LOG_FILE))
+
+class LogPipeline:
+    # A full queue drops records from the channel feed (they're still in the
+    # local file) rather than make the caller wait. The batch in progress
+    # lives on `self.batch` so close() can still deliver it.
+    def __init__(self, maxsize=LOG_QUEUE_SIZE, interval_ms=LOG_FLUSH_MS):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.interval = interval_ms / 1000
+        self.carry = None
+        self.batch = []
+        self.channel = None
+        self.disabled = False
+        self.task = None
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.records = 0
+        self.messages = 0
+        self.send_failures = 0
+
+    def start(self):
+        if self.task is not None:
+            return
+        try:
+            self.channel = bot.get_partial_messageable(int(os.environ.get("LOG_CHANNEL_ID")))
+        except (TypeError, ValueError):
+            print("LOG_CHANNEL_ID is missing or invalid; logging to the local file only")
+            self.disabled = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return
+        self.task = asyncio.create_task(self.run())
+
+    def submit(self, text):
         now = datetime.now()
+        self.records += 1
+        logger.info(json.dumps({"ts": now.isoformat(timespec="milliseconds"), "event": text}))
+        if self.disabled:
+            return
+
         timestamp = now.strftime("%d/%m/%Y] %H:%M:%S") + f".{now.strftime('%f')[:3]}"
+        try:
+            self.queue.put_nowait(f"`[{timestamp} || {text}`"[:1990])
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "records": self.records,
+            "messages": self.messages,
+            "dropped": self.dropped,
+            "send_failures": self.send_failures
+        }
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        first = self.carry if self.carry is not None else await self.queue.get()
+        self.carry = None
+        batch, size = self.batch, len(first)
+        batch.append(first)
+        deadline = loop.time() + self.interval
+        while True:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                line = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if size + len(line) + 1 > 2000:
+                self.carry = line
+                break
+            batch.append(line)
+            size += len(line) + 1
+        return batch
+
+    async def _send(self, batch):
+        text = "\n".join(batch)
+        if self.dropped > self.reported_dropped:
+            notice = f"`{self.dropped - self.reported_dropped} log records dropped (queue full)`"
+            if len(text) + len(notice) < 2000:
+                text = f"{text}\n{notice}"
+                self.reported_dropped = self.dropped
+        if self.channel is None:
+            return
+        try:
+            await dispatcher.send(f"send:{self.channel.id}", PRIORITY_LOG, partial(self.channel.send, text))
+            self.messages += 1
+        except Exception as e:
+            self.send_failures += 1
+            logger.warning(json.dumps({"event": "log channel send failed", "error": str(e)}))
 
-        timestamped_text = f"`[{timestamp} || {text}`"
-        await channel.send(timestamped_text)
-    else:
-        print(f"Logged failed: Channel not found. Message: {text}")
+    async def run(self):
+        while True:
+            await self._send(await self._next_batch())
+            self.batch = []
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        lines, self.batch = self.batch, []
+        if self.carry:
+            lines.append(self.carry)
+        while not self.queue.empty():
+            lines.append(self.queue.get_nowait())
+        while lines:
+            batch, size = [], 0
+            while lines and size + len(lines[0]) + 1 <= 2000:
+                size += len(lines[0]) + 1
+                batch.append(lines.pop(0))
+            await self._send(batch)
+
+log_pipeline = LogPipeline()
+
+async def log_event(text: str):
+    # never waits on Discord; see LogPipeline
+    log_pipeline.submit(text)
+
+################################
+
+def draw_winners(entries, seed, count, exclude=()):
+    # `entries` must be sorted by user_id so anyone can re-run a draw from an
+    # export. Draw i picks sha256(f"{seed}:{i}") mod the remaining weight,
+    # located in a Fenwick tree of weights.
+    exclude = set(exclude)
+    users = [uid for uid, _ in entries if uid not in exclude]
+    weights = [weight for uid, weight in entries if uid not in exclude]
+    n = len(users)
+    tree = [0] * (n + 1)
+    for i in range(1, n + 1):
+        tree[i] += weights[i - 1]
+        parent = i + (i & -i)
+        if parent <= n:
+            tree[parent] += tree[i]
+
+    total = sum(weights)
+    top = 1 << n.bit_length()
+    winners = []
+    for draw in range(min(count, n)):
+        if total <= 0:
+            break
+        remaining = int(hashlib.sha256(f"{seed}:{draw}".encode()).hexdigest(), 16) % total
+        pos, step = 0, top
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= tree[nxt]
+            step >>= 1
+        winners.append(users[pos])
+
+        weight = weights[pos]
+        weights[pos] = 0
+        total -= weight
+        i = pos + 1
+        while i <= n:
+            tree[i] -= weight
+            i += i & -i
+    return winners
+
+def verify_draw(doc, entries):
+    # Re-runs every recorded draw of a giveaway against its entrants.
+    for draw in doc.get("draws", []):
+        if draw_winners(entries, draw["seed"], len(draw["winners"]), draw["excluded"]) != draw["winners"]:
+            return False
+    return True
+
+async def make_seed(gid):
+    api_val, source = await entropy.get()
+    metrics.inc("entropy_draws_total", source=source)
+    seed = hashlib.sha256(f"{gid}:{api_val}:{time.time_ns()}".encode()).hexdigest()
+    return seed, source
+
+def mention_list(user_ids):
+    return ", ".join(f"<@{uid}>" for uid in user_ids)
+
+RANDOM_ORG_URL = os.environ.get("RANDOM_ORG_URL", "https://www.random.org/integers/")
+ENTROPY_PROVIDER = os.environ.get("ENTROPY_PROVIDER", "random.org")
+ENTROPY_BATCH = int(os.environ.get("ENTROPY_BATCH", 100))
+ENTROPY_LOW_WATER = int(os.environ.get("ENTROPY_LOW_WATER", 20))
+ENTROPY_TIMEOUT = float(os.environ.get("ENTROPY_TIMEOUT", 5))
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", 3))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", 60))
+ENTROPY_MAX = 1000000000
+
+class SecretsEntropy:
+    source = "secrets"
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self):
+        return secrets.randbelow(ENTROPY_MAX) + 1, "secrets"
+
+    def status(self):
+        return "local"
+
+class RandomOrgEntropy(SecretsEntropy):
+    # Draws never wait on the network: with the buffer empty they fall back
+    # to `secrets` straight away while the refill carries on.
+    source = "random.org"
+
+    def __init__(self, url=RANDOM_ORG_URL, batch=ENTROPY_BATCH, low_water=ENTROPY_LOW_WATER, timeout=ENTROPY_TIMEOUT):
+        self.url = url
+        self.batch = batch
+        self.low_water = low_water
+        self.timeout = timeout
+        self.buffer = deque()
+        self.session = None
+        self.refill_task = None
+        self.failures = 0
+        self.open_until = 0
+
+    async def start(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=2, keepalive_timeout=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        self._refill_soon()
+
+    async def close(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def breaker_open(self):
+        return time.monotonic() < self.open_until
+
+    def status(self):
+        if self.breaker_open():
+            return f"breaker open for {round(self.open_until - time.monotonic())}s"
+        return f"{len(self.buffer)} buffered, {self.failures} recent failures"
+
+    def _refill_soon(self):
+        if self.session is None or self.breaker_open():
+            return
+        if self.refill_task is None or self.refill_task.done():
+            self.refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        params = {
+            "num": self.batch, "min": 1, "max": ENTROPY_MAX, "col": 1,
+            "base": 10, "format": "plain", "rnd": "new"
+        }
+        start = time.perf_counter()
+        try:
+            async with self.session.get(self.url, params=params) as res:
+                res.raise_for_status()
+                text = await res.text()
+            self.buffer.extend(int(line) for line in text.split())
+            self.failures = 0
+            metrics.observe("entropy_fetch_seconds", time.perf_counter() - start, result="ok")
+        except Exception as e:
+            metrics.observe("entropy_fetch_seconds", time.perf_counter() - start, result="error")
+            self.failures += 1
+            if self.failures >= BREAKER_THRESHOLD:
+                self.open_until = time.monotonic() + BREAKER_COOLDOWN
+                self.failures = 0
+            print(f"Random.org refill failed: {e}")
+
+    async def get(self):
+        if len(self.buffer) <= self.low_water:
+            self._refill_soon()
+        if self.buffer:
+            return self.buffer.popleft(), self.source
+        return await super().get()
+
+entropy = RandomOrgEntropy() if ENTROPY_PROVIDER == "random.org" else SecretsEntropy()
+
+################################
+
+RECONCILE_MINUTES = float(os.environ.get("RECONCILE_MINUTES", 5))
+
+def to_timestamp(dt):
+    # pymongo hands back naive datetimes that are already UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+class GiveawayScheduler:
+    # Min-heap of (end_time, giveaway_id, channel_id). Entries are never removed in place;
+    # `deadlines` holds the live deadline per giveaway and stale heap entries
+    # are skipped when they surface.
+    def __init__(self, callback):
+        self.callback = callback
+        self.heap = []
+        self.deadlines = {}
+        self.wake = asyncio.Event()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def schedule(self, gid, end_time, channel_id=None):
+        ts = to_timestamp(end_time) if isinstance(end_time, datetime) else end_time
+        if self.deadlines.get(gid) == ts:
+            return
+        self.deadlines[gid] = ts
+        heapq.heappush(self.heap, (ts, gid, channel_id))
+        self.wake.set()
+
+    def cancel(self, gid):
+        if self.deadlines.pop(gid, None) is not None:
+            self.wake.set()
+
+    def _discard_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    async def run(self):
+        while True:
+            self.wake.clear()
+            self._discard_stale()
+            if not self.heap:
+                await self.wake.wait()
+                continue
+
+            ts, gid, channel_id = self.heap[0]
+            delay = ts - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self.heap)
+            del self.deadlines[gid]
+            try:
+                await self.callback(gid, channel_id)
+            except Exception as e:
+                print(f"Scheduler error: {e}")
+                await log_event(f"Scheduler error while ending giveaway [{gid}]: {e}")
+
+ENDING_CONCURRENCY = int(os.environ.get("ENDING_CONCURRENCY", 4))
+ENDING_STAGES = ["deleted", "drawn", "announced"]
+
+class EndingPipeline:
+    # Ends giveaways concurrently, at most ENDING_CONCURRENCY at a time.
+    # Giveaways in the same channel still end one after another, in the order
+    # they were submitted.
+    def __init__(self, worker, concurrency=ENDING_CONCURRENCY):
+        self.worker = worker
+        self.slots = asyncio.Semaphore(concurrency)
+        # channel_id -> [lock, giveaways holding or waiting on it]; dropped
+        # once the last one is done so idle channels don't accumulate
+        self.channel_locks = {}
+        self.in_flight = {}
+
+    def submit(self, gid, channel_id=None):
+        if gid in self.in_flight:
+            return self.in_flight[gid]
+        task = asyncio.create_task(self._process(gid, channel_id))
+        self.in_flight[gid] = task
+        task.add_done_callback(lambda _: self.in_flight.pop(gid, None))
+        return task
+
+    async def _process(self, gid, channel_id):
+        entry = self.channel_locks.setdefault(channel_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self.slots:
+                    try:
+                        await self.worker(gid)
+                    except Exception as e:
+                        print(f"Ending error: {e}")
+                        await log_event(f"Error while ending giveaway [{gid}]: {e}. Will resume on next reconcile.")
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.channel_locks[channel_id]
 
 ################################
 
-class MyBot(commands.Bot):
+LEGACY_ROLE_WEIGHTS = {"🏆 x3 Entries": 3, "🏆 x2 Entries": 2}
+
+class RoleRules:
+    # guild_rules: {"_id": guild_id, "weights": {"<role_id>": weight}, "required": [role_id], "blocked": [role_id]}
+    # Guilds without a document get the legacy trophy roles, looked up by name.
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents, proxy=proxy_url)
+        self.rules = {}
+        self.loading = {}
+
+    def invalidate(self, guild_id):
+        self.rules.pop(guild_id, None)
+        self.loading.pop(guild_id, None)
+
+    async def get(self, guild):
+        rules = self.rules.get(guild.id)
+        if rules is not None:
+            return rules
+        task = self.loading.get(guild.id)
+        if task is None:
+            task = self.loading[guild.id] = asyncio.create_task(self._load(guild))
+        try:
+            rules = await asyncio.shield(task)
+        except Exception:
+            if self.loading.get(guild.id) is task:
+                del self.loading[guild.id]
+            raise
+        # an invalidate() while loading means this result is already stale
+        if self.loading.get(guild.id) is task:
+            del self.loading[guild.id]
+            self.rules[guild.id] = rules
+        return rules
+
+    async def _load(self, guild):
+        doc = await store.get_guild_rules(guild.id)
+        if doc is None:
+            weights = {role.id: LEGACY_ROLE_WEIGHTS[role.name] for role in guild.roles if role.name in LEGACY_ROLE_WEIGHTS}
+            return {"weights": weights, "required": frozenset(), "blocked": frozenset(), "legacy": True}
+        return {
+            "weights": {int(role_id): weight for role_id, weight in doc.get("weights", {}).items()},
+            "required": frozenset(doc.get("required", [])),
+            "blocked": frozenset(doc.get("blocked", [])),
+            "legacy": False
+        }
+
+    async def evaluate(self, member):
+        # (weight, None) for an eligible member, (0, reason) otherwise
+        rules = await self.get(member.guild)
+        role_ids = {role.id for role in member.roles}
+        if rules["blocked"] & role_ids:
+            return 0, "One of your roles is not allowed to enter this giveaway."
+        if rules["required"] and not rules["required"] & role_ids:
+            return 0, "You don't have a role required to enter this giveaway."
+        return max((rules["weights"][r] for r in role_ids & rules["weights"].keys()), default=1), None
+
+role_rules = RoleRules()
+
+################################
+
+def register_queue_gauges(bot):
+    metrics.gauge("scheduler_pending", lambda: len(bot.scheduler.deadlines))
+    metrics.gauge("ending_in_flight", lambda: len(bot.pipeline.in_flight))
+    metrics.gauge("dispatcher_queued", lambda: len(dispatcher.heap))
+    metrics.gauge("dispatcher_routes", lambda: len(dispatcher.buckets))
+    metrics.gauge("log_queue_depth", lambda: log_pipeline.queue.qsize())
+    metrics.counter("log_records_dropped_total", lambda: log_pipeline.dropped)
+    metrics.gauge("live_counter_dirty", lambda: sum(len(g) for g in list(live_counter.dirty.values())))
+    metrics.counter("cache_hits_total", lambda: store.cache.hits)
+    metrics.counter("cache_misses_total", lambda: store.cache.misses)
+    metrics.gauge("cache_giveaways", lambda: len(store.cache.entries))
+    metrics.gauge("gateway_latency_seconds", lambda: bot.latency)
+    if entry_buffer:
+        metrics.gauge("entry_buffer_pending", lambda: entry_buffer.pending_count)
+
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+SHARD_IDS = [int(i) for i in os.environ["SHARD_IDS"].split(",")] if os.environ.get("SHARD_IDS") else None
+PROCESS_ID = os.environ.get("PROCESS_ID", f"{socket.gethostname()}:{os.getpid()}")
+LEASE_SECONDS = int(os.environ.get("LEASE_SECONDS", 120))
+TAKEOVER_GRACE = int(os.environ.get("TAKEOVER_GRACE", 180))
+
+def owns_guild(guild_id):
+    # With SHARD_COUNT/SHARD_IDS set, this process only serves the guilds of
+    # its own shards. Giveaways without a guild_id belong to shard 0.
+    if SHARD_COUNT is None or SHARD_IDS is None:
+        return True
+    shard_id = (guild_id >> 22) % SHARD_COUNT if guild_id else 0
+    return shard_id in SHARD_IDS
+
+DEV_GUILD_ID = int(os.environ["DEV_GUILD_ID"]) if os.environ.get("DEV_GUILD_ID") else None
+
+def command_payload(cmd, tree):
+    # to_dict() only takes the tree from discord.py 2.4 on
+    try:
+        return cmd.to_dict(tree)
+    except TypeError:
+        return cmd.to_dict()
+
+def command_tree_hash(tree, guild=None):
+    payload = sorted((command_payload(cmd, tree) for cmd in tree.get_commands(guild=guild)), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class MyBot(commands.AutoShardedBot):
+    def __init__(self):
+        super().__init__(command_prefix="!", intents=intents, proxy=proxy_url, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
         self.first_run = True
+        self.scheduler = GiveawayScheduler(self.end_due_giveaway)
+        self.pipeline = EndingPipeline(self.end_giveaway)
+        self.timings = {}
+        self.warm_task = None
     
+    async def phase(self, name, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            metrics.observe("startup_phase_seconds", self.timings[name], phase=name)
+
+    # Startup only blocks the gateway connection on what clicks depend on
+    # (schema, journal replay, entropy). Command sync and loading the open
+    # giveaways run as warm_up() alongside the login.
     async def setup_hook(self):
+        self.boot_started = time.perf_counter()
         self.add_view(GiveawayEndedView(self))
         self.add_view(GiveawayView(None))
-        db["active_giveaways"].create_index("end_time", expireAfterSeconds=2592000)
-        self.check_giveaways.start()
-        await self.tree.sync()
+        await self.phase("schema", self.check_schema())
+        asyncio.create_task(monitor_loop_lag())
+        register_queue_gauges(self)
+        dispatcher.start()
+        live_counter.start()
+        log_pipeline.start()
+        await self.phase("entropy", entropy.start())
+        if entry_buffer:
+            await self.phase("journal_replay", entry_buffer.start())
+        self.scheduler.start()
+        self.warm_task = asyncio.create_task(self.warm_up())
+        self.timings["setup_hook"] = time.perf_counter() - self.boot_started
         print(f"Logged in as {self.user}")
 
+    async def check_schema(self):
+        if await store.get_meta("schema_version") == SCHEMA_VERSION:
+            return
+        await store.ensure_indexes()
+        migrated = await store.migrate_legacy_entrants()
+        if migrated:
+            print(f"Migrated {migrated} giveaways to weighted entrant storage")
+        await store.set_meta("schema_version", SCHEMA_VERSION)
+        print(f"Schema upgraded to version {SCHEMA_VERSION}")
+
+    async def warm_up(self):
+        results = await asyncio.gather(
+            self.phase("command_sync", self.sync_commands()),
+            self.phase("warm_state", self.reconcile(warm=True)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Startup error: {result}")
+        self.check_giveaways.start()
+
+    async def sync_commands(self):
+        # Global sync is slow and heavily rate limited, so it only happens when
+        # the command tree actually changed. DEV_GUILD_ID syncs to that guild
+        # instead, which applies immediately.
+        guild = discord.Object(id=DEV_GUILD_ID) if DEV_GUILD_ID else None
+        if guild:
+            self.tree.copy_global_to(guild=guild)
+        key = f"command_hash:{DEV_GUILD_ID or 'global'}"
+        digest = command_tree_hash(self.tree, guild)
+        if await store.get_meta(key) == digest:
+            return
+        await self.tree.sync(guild=guild)
+        await store.set_meta(key, digest)
+        print(f"Synced application commands ({'guild ' + str(DEV_GUILD_ID) if guild else 'global'})")
+
+    def startup_report(self):
+        return " | ".join(f"{name}: {round(seconds * 1000)}ms" for name, seconds in self.timings.items())
+
+    async def on_guild_role_create(self, role):
+        role_rules.invalidate(role.guild.id)
+
+    async def on_guild_role_update(self, before, after):
+        role_rules.invalidate(after.guild.id)
+
+    async def on_guild_role_delete(self, role):
+        role_rules.invalidate(role.guild.id)
+
+    async def close(self):
+        if entry_buffer:
+            await entry_buffer.close()
+        await entropy.close()
+        await log_pipeline.close()
+        await super().close()
+
     async def on_ready(self):
 
         if not self.first_run:
             return
-        
+        self.first_run = False
+        self.timings["gateway_ready"] = time.perf_counter() - self.boot_started
+        await self.warm_task
+        print(f"Startup timings: {self.startup_report()}")
+
         log_channel_id = int(os.environ.get("LOG_CHANNEL_ID"))
         channel = self.get_channel(log_channel_id)
         if channel:
@@ -83,167 +1786,425 @@ class MyBot(commands.Bot):
             )
             embed.add_field(name="Version", value="v1.0.4-stable", inline=True)
             embed.add_field(name="Latency", value=f"{round(self.latency * 1000)}ms", inline=True)
+            embed.add_field(name="Startup", value=f"```{self.startup_report()}```", inline=False)
             embed.set_footer(text=f"Logged in as {self.user}")
             await channel.send(embed=embed)
             await log_event("Bot has successfully started/restarted.")
 
-        self.first_run = False
-
     #################################
-    @tasks.loop(seconds=30)
+    @tasks.loop(minutes=RECONCILE_MINUTES)
     async def check_giveaways(self):
-        now = datetime.now(timezone.utc)
-        ended = giveaways_col.find({
-            "end_time": {"$lte": now},
-            "ended": {"$ne": True}
-        })
+        await self.reconcile()
 
-        for g in ended:
-            giveaways_col.update_one({"_id": g["_id"]}, {"$set": {"ended": True}})
-            channel = self.get_channel(g["channel_id"])
-            if channel:
-                await log_event(f"Giveaway ended for [{g['title']}] with ID [{g['_id']}]. Attempting to delete initial giveaway interface...")
-                try:
-                    old_msg = await channel.fetch_message(g["message_id"])
-                    await old_msg.delete()
-                    await log_event(f"Deletion successful for message with ID [{g['message_id']}].")
-                except:
-                    await log_event("Message may have been deleted. Passing...")
-                    pass
-                
-                await asyncio.sleep(1)
+    @check_giveaways.before_loop
+    async def before_check_giveaways(self):
+        # warm_up() has just done the first pass
+        await asyncio.sleep(RECONCILE_MINUTES * 60)
 
-                if len(g["entrants"]) > 0:
-                    try:
-                        await log_event("Attempting to reach Random.org API...")
-                        try:
-                            res = requests.get("https://www.random.org/integers/?num=1&min=1&max=100&col=1&base=10&format=plain&rnd=new", timeout=5)
-                            api_val = int(res.text.strip())
-                            await log_event("Successfully reached API. Result valid.")
-                        except Exception as e:
-                            api_val = secrets.randbelow(100)
-                            await log_event(f"Error with API: {e}. Using standard randomizer as subtitute...")
-
-                        await log_event("Attempting randomization...")
-                        seed = f"{api_val}{time.time_ns()}".encode()
-                        hex_hash = hashlib.sha256(seed).hexdigest()
-                        short_hash = hex_hash[:12].upper()
-                        
-                        winner_idx = int(hex_hash, 16) % len(g["entrants"])
-                        winner_id = g["entrants"][winner_idx]
-                        await log_event("Randomization successful...")
-
-                        giveaways_col.update_one({"_id": g["_id"]}, {"$set": {"final_hash": short_hash}})
-                        await log_event("Database updated.")
-
-                        await log_event("Creating embed...")
-                        
-                        is_final_status = g.get("is_final", False)
-                        
-                        if is_final_status:
-                            end_title = "FINAL GIVEAWAY ENDED 🎊"
-                            end_color = 0x00008B
-                            end_image = "https://i.imgur.com/8tFAxzY.png"
-                        else:
-                            end_title = "GIVEAWAY ENDED 🎊"
-                            end_color = 0x3498db
-                            end_image = "https://i.imgur.com/BRNcUVE.png"
-                        
-                        embed = discord.Embed(
-                            title=end_title,
-                            description=f"**Winner**: <@{winner_id}>\n**Giveaway Won**: **{g['title']}**\n//////////////////////////////////////////////////",
-                            color=end_color
-                        )
-                        embed.set_image(url=end_image)
-                        embed.set_footer(text=f"Giveaway ID: {g['_id']}")
-                        
-                        await channel.send(embed=embed, view=GiveawayEndedView(self, g["entrants"], g["title"], g["_id"], hash_val=short_hash))
-                        await asyncio.sleep(1)
-                        await channel.send(f"<@{winner_id}>")
-
-                        await log_event("Message sent successfully.")
-                    except Exception as e:
-                        print(f"API Error: {e}")
-                        await log_event(f"API Error: {e}")
+    async def reconcile(self, warm=False):
+        # Other processes' giveaways are queued TAKEOVER_GRACE seconds late, so
+        # they're only taken over when their owner failed to end them. Errors
+        # are only logged: an exception would stop check_giveaways for good.
+        try:
+            if warm:
+                pending = await store.warm_cache()
+            else:
+                pending = await store.find({"ended": {"$ne": True}}, {"end_time": 1, "channel_id": 1, "guild_id": 1})
+            for g in pending:
+                end_time = to_timestamp(g["end_time"])
+                if not owns_guild(g.get("guild_id")):
+                    end_time += TAKEOVER_GRACE
+                self.scheduler.schedule(g["_id"], end_time, g["channel_id"])
+        except Exception as e:
+            print(f"Reconcile error: {e}")
+            await log_event(f"Reconcile could not queue open giveaways: {e}")
+
+        # ended giveaways whose archiving was interrupted, or that ended
+        # before the archive existed; ARCHIVE_SWEEP_BATCH per pass, in parallel
+        try:
+            swept = await store.find({"ended": True}, {"_id": 1}, limit=ARCHIVE_SWEEP_BATCH)
+            results = await asyncio.gather(*(store.archive_giveaway(g["_id"]) for g in swept), return_exceptions=True)
+            for g, result in zip(swept, results):
+                if isinstance(result, Exception):
+                    print(f"Archiving [{g['_id']}] failed: {result}")
                 else:
-                    await channel.send(f"Giveaway for **{g['title']}** ended with no entries.")
-                    await log_event(f"Giveaway with title [{g['title']}] and ID [{g['_id']}] ended without entrants.")
-            
-            await asyncio.sleep(1)
+                    remove_export(g["_id"])
+        except Exception as e:
+            print(f"Reconcile error: {e}")
+            await log_event(f"Reconcile archive sweep failed: {e}")
+
+    async def end_due_giveaway(self, gid, channel_id):
+        self.pipeline.submit(gid, channel_id)
+
+    # `end_stage` records the last completed stage, so reconcile resumes a
+    # crashed ending where it left off. The lease is renewed while a stage
+    # runs, so a rate-limited announce can't outlive it.
+    async def end_giveaway(self, gid):
+        g = await store.claim_giveaway(gid, PROCESS_ID, LEASE_SECONDS)
+        if not g:
+            return
+        renewer = asyncio.create_task(self.hold_lease(gid))
+        try:
+            await self.run_ending(g)
+        finally:
+            renewer.cancel()
+
+    async def hold_lease(self, gid):
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                if not await store.renew_lease(gid, PROCESS_ID, LEASE_SECONDS):
+                    return
+            except Exception as e:
+                print(f"Lease renewal for [{gid}] failed: {e}")
+
+    async def run_ending(self, g):
+        gid = g["_id"]
+        if not g.get("end_stage"):
+            metrics.observe("scheduler_lateness_seconds", max(0.0, time.time() - to_timestamp(g["end_time"])))
+        if not owns_guild(g.get("guild_id")):
+            await log_event(f"Taking over giveaway [{g['title']}] with ID [{gid}] from another process.")
+
+        try:
+            channel = self.get_channel(g["channel_id"]) or await self.fetch_channel(g["channel_id"])
+        except (discord.NotFound, discord.Forbidden):
+            channel = None
+        if not channel:
+            await store.update_one({"_id": gid}, {"$set": {"ended": True}})
+            await log_event(f"Channel for giveaway [{g['title']}] with ID [{gid}] not found. Marked as ended.")
+            await store.archive_giveaway(gid)
+            return remove_export(gid)
+
+        done = ENDING_STAGES.index(g["end_stage"]) + 1 if g.get("end_stage") else 0
+
+        if done < 1:
+            await log_event(f"Giveaway ended for [{g['title']}] with ID [{gid}]. Attempting to delete initial giveaway interface...")
+            try:
+                old_msg = channel.get_partial_message(g["message_id"])
+                await dispatcher.send(f"delete:{channel.id}", PRIORITY_DELETE, old_msg.delete)
+                await log_event(f"Deletion successful for message with ID [{g['message_id']}].")
+            except:
+                await log_event("Message may have been deleted. Passing...")
+                pass
+            await store.update_one({"_id": gid}, {"$set": {"end_stage": "deleted"}})
+
+        if not await store.renew_lease(gid, PROCESS_ID, LEASE_SECONDS):
+            return await log_event(f"Lost lease on giveaway [{gid}]. Leaving it to the new owner.")
+
+        if done < 2:
+            if entry_buffer:
+                await entry_buffer.drain(gid)
+                g = await store.find_one({"_id": gid})
+            entries = await store.entrant_weights(gid, by_user=True) if g.get("total_weight", 0) > 0 else []
+            g["winners"] = []
+            draws = []
+            if entries:
+                seed, source = await make_seed(gid)
+                if source == "random.org":
+                    await log_event("Random.org value taken from buffer. Result valid.")
+                else:
+                    await log_event(f"Random.org unavailable ({entropy.status()}). Using standard randomizer as subtitute...")
+
+                await log_event("Attempting randomization...")
+                g["winners"] = await asyncio.to_thread(draw_winners, entries, seed, g.get("winners_count", 1))
+                g["seed"] = seed
+                g["final_hash"] = seed[:12].upper()
+                draws.append({"seed": seed, "winners": g["winners"], "excluded": []})
+                await log_event("Randomization successful...")
+
+            await store.update_one({"_id": gid}, {"$set": {
+                "end_stage": "drawn",
+                "winners": g["winners"],
+                "past_winners": g["winners"],
+                "draws": draws,
+                "seed": g.get("seed"),
+                "final_hash": g.get("final_hash")
+            }})
+            await log_event("Database updated.")
+
+        if not await store.renew_lease(gid, PROCESS_ID, LEASE_SECONDS):
+            return await log_event(f"Lost lease on giveaway [{gid}]. Leaving it to the new owner.")
+
+        if not g["winners"]:
+            text = f"Giveaway for **{g['title']}** ended with no entries."
+            await self.send_once(channel, g, "empty_message_id", lambda m: m.content == text, partial(channel.send, text))
+            await log_event(f"Giveaway with title [{g['title']}] and ID [{gid}] ended without entrants.")
+        else:
+            if not g.get("announce_message_id"):
+                await log_event("Creating embed...")
+                if g.get("is_final", False):
+                    end_title = "FINAL GIVEAWAY ENDED 🎊"
+                    end_color = 0x00008B
+                    end_image = "https://i.imgur.com/8tFAxzY.png"
+                else:
+                    end_title = "GIVEAWAY ENDED 🎊"
+                    end_color = 0x3498db
+                    end_image = "https://i.imgur.com/BRNcUVE.png"
+
+                embed = discord.Embed(
+                    title=end_title,
+                    description=f"**{'Winners' if len(g['winners']) > 1 else 'Winner'}**: {mention_list(g['winners'])}\n**Giveaway Won**: **{g['title']}**\n//////////////////////////////////////////////////",
+                    color=end_color
+                )
+                embed.set_image(url=end_image)
+                embed.set_footer(text=f"Giveaway ID: {gid}")
+
+                view = GiveawayEndedView(self, g["title"], gid, hash_val=g["final_hash"])
+                footer = f"Giveaway ID: {gid}"
+                await self.send_once(
+                    channel, g, "announce_message_id",
+                    lambda m: any(e.footer.text == footer and e.title == end_title for e in m.embeds),
+                    partial(channel.send, embed=embed, view=view)
+                )
+
+            pings = " ".join(f"<@{uid}>" for uid in g["winners"])
+            await self.send_once(channel, g, "ping_message_id", lambda m: m.content == pings, partial(channel.send, pings))
+            await log_event("Message sent successfully.")
+
+        await store.update_one({"_id": gid}, {
+            "$set": {"ended": True, "end_stage": "announced"},
+            "$unset": {"lease_owner": "", "lease_until": ""}
+        })
+        await store.archive_giveaway(gid)
+        remove_export(gid)
+
+    # `key` is 0 while a send is in flight; a resume that finds 0 looks for
+    # the message in recent history before sending it again.
+    async def send_once(self, channel, g, key, match, factory):
+        if g.get(key):
+            return
+        if g.get(key) == 0:
+            async for msg in channel.history(limit=25):
+                if msg.author == self.user and match(msg):
+                    await store.update_one({"_id": g["_id"]}, {"$set": {key: msg.id}})
+                    return
+        await store.update_one({"_id": g["_id"]}, {"$set": {key: 0}})
+        msg = await dispatcher.send(f"send:{channel.id}", PRIORITY_ANNOUNCE, factory)
+        await store.update_one({"_id": g["_id"]}, {"$set": {key: msg.id}})
 
 bot = MyBot()
 
+# A line is at most ~35 characters, so 50 lines always fit Discord's 2000
+# character embed description limit and page N is simply entrants N*size
+# to (N+1)*size. Only the page being viewed is read and rendered.
+ENTRANTS_PER_PAGE = min(int(os.environ.get("ENTRANTS_PER_PAGE", 25)), 50)
+
+def render_entrant_page(rows):
+    lines = []
+    for uid, weight in rows:
+        multiplier_text = f" (x{weight})" if weight > 1 else ""
+        lines.append(f"• <@{uid}>{multiplier_text}")
+    return "\n".join(lines)
+
+async def entrant_page(gid, page):
+    text = store.cache.get_page(gid, page)
+    if text is None:
+        since = store.cache.version
+        text = render_entrant_page(await store.entrant_page(gid, page * ENTRANTS_PER_PAGE, ENTRANTS_PER_PAGE))
+        store.cache.put_page(gid, page, text, since)
+    return text
+
+class EntrantsPageView(discord.ui.View):
+    def __init__(self, giveaway_id, title, footer_label, page=0):
+        super().__init__(timeout=180)
+        self.giveaway_id = giveaway_id
+        self.title = title
+        self.footer_label = footer_label
+        self.page = page
+
+    async def render(self):
+        doc = await store.get_giveaway(self.giveaway_id)
+        count = doc.get("entry_count", 0) if doc else 0
+        pages = max(1, -(-count // ENTRANTS_PER_PAGE))
+        self.page = max(0, min(self.page, pages - 1))
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+
+        description = await entrant_page(self.giveaway_id, self.page) if count else ""
+        total = doc.get("total_weight", 0) if doc else 0
+        embed = discord.Embed(title=self.title, description=description or "No entries.", color=0x3498db)
+        embed.set_footer(text=f"{self.footer_label}: {total} | Page {self.page + 1}/{pages}")
+        return embed
+
+    @discord.ui.button(label="Prev", style=discord.ButtonStyle.gray)
+    @timed("EntrantsPageView.prev_page")
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray)
+    @timed("EntrantsPageView.next_page")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+EXPORT_FORMAT = os.environ.get("EXPORT_FORMAT", "csv")
+EXPORT_BATCH = int(os.environ.get("EXPORT_BATCH", 1000))
+EXPORT_MAX_BYTES = int(os.environ.get("EXPORT_MAX_BYTES", 10 * 1024 * 1024))
+export_tasks = {}
+
+def remove_export(gid):
+    # exports are rebuilt on demand, so they are dropped once a giveaway is
+    # archived or cancelled instead of piling up in EXPORT_DIR
+    path = os.path.join(EXPORT_DIR, f"{gid}.{EXPORT_FORMAT}")
+    for stale in (path, f"{path}.tmp", f"{path}.gz"):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+
+def _gzip_file(path):
+    with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+    return f"{path}.gz"
+
+async def build_export(gid):
+    # Ended giveaways can't change, so their export is written once and then
+    # served from disk. Files over EXPORT_MAX_BYTES are gzipped to fit the
+    # attachment limit.
+    path = os.path.join(EXPORT_DIR, f"{gid}.{EXPORT_FORMAT}")
+    for cached in (path, f"{path}.gz"):
+        if os.path.exists(cached):
+            return cached
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    await store.export_entrants(gid, path, EXPORT_FORMAT, EXPORT_BATCH)
+    if os.path.getsize(path) > EXPORT_MAX_BYTES:
+        path = await store.run(_gzip_file, path)
+    return path
+
+async def export_file(gid):
+    # concurrent clicks share one export job
+    if gid not in export_tasks:
+        task = asyncio.create_task(build_export(gid))
+        export_tasks[gid] = task
+        task.add_done_callback(lambda _: export_tasks.pop(gid, None))
+    return await asyncio.shield(export_tasks[gid])
+
+def resolve_giveaway_id(giveaway_id, interaction):
+    # Persistent views come back after a restart without their giveaway ID,
+    # so it is read from the embed footer once per message and remembered.
+    if giveaway_id:
+        return giveaway_id
+    gid = store.cache.message_gids.get(interaction.message.id)
+    if gid is None:
+        footer = interaction.message.embeds[0].footer.text
+        gid = footer.split("Giveaway ID: ")[1].strip()
+        store.cache.remember_message(interaction.message.id, gid)
+    return gid
+
 class GiveawayEndedView(discord.ui.View):
-    def __init__(self, bot, entrants=None, title=None, giveaway_id=None, hash_val=None):
+    def __init__(self, bot, title=None, giveaway_id=None, hash_val=None):
         super().__init__(timeout=None)
         self.bot = bot
-        self.entrants = entrants or []
         self.title = title or "Giveaway"
         self.giveaway_id = giveaway_id
         self.hash_val = hash_val
 
     @discord.ui.button(label="View Entrants", style=discord.ButtonStyle.gray, custom_id="view_ended_btn")
+    @timed("GiveawayEndedView.view_list")
     async def view_list(self, interaction: discord.Interaction, button: discord.ui.Button):
-        doc = giveaways_col.find_one({"_id": self.giveaway_id})
-        
-        if not doc or not doc.get("entrants"):
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
             return await interaction.response.send_message("No entries found.", ephemeral=True)
 
-        unique_entrants = list(set(doc["entrants"]))
-        entry_lines = []
-        for uid in unique_entrants:
-            count = doc["entrants"].count(uid)
-            multiplier_text = f" (x{count})" if count > 1 else ""
-            entry_lines.append(f"• <@{uid}>{multiplier_text}")
-
-        description = "\n".join(entry_lines)
-        if len(description) > 2000:
-            description = f"List too long to display. Total entries: {len(doc['entrants'])}"
+        doc = await store.get_giveaway(gid)
+        if not doc or not doc.get("total_weight"):
+            return await interaction.response.send_message("No entries found.", ephemeral=True)
 
-        embed = discord.Embed(title="Final Entrants List", description=description, color=0x3498db)
-        embed.set_footer(text=f"Total Entrants: {len(doc['entrants'])}")
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        view = EntrantsPageView(gid, "Final Entrants List", "Total Entrants")
+        await interaction.response.send_message(embed=await view.render(), view=view, ephemeral=True)
     
     
     
+    @discord.ui.button(label="Export", style=discord.ButtonStyle.gray, custom_id="export_btn")
+    @timed("GiveawayEndedView.export")
+    async def export(self, interaction: discord.Interaction, button: discord.ui.Button):
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
+            return await interaction.response.send_message("Could not find Giveaway ID.", ephemeral=True)
+
+        doc = await store.get_giveaway(gid)
+        if not doc or not doc.get("total_weight"):
+            return await interaction.response.send_message("No entries found.", ephemeral=True)
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            path = await export_file(gid)
+        except Exception as e:
+            await log_event(f"Export failed for giveaway [{gid}]: {e}")
+            return await interaction.followup.send("Export failed.", ephemeral=True)
+
+        if os.path.getsize(path) > EXPORT_MAX_BYTES:
+            return await interaction.followup.send("Export is too large to attach.", ephemeral=True)
+
+        await interaction.followup.send(
+            f"Entrants for **{doc['title']}** ({doc['entry_count']} users, {doc['total_weight']} entries).",
+            file=discord.File(path, filename=os.path.basename(path)),
+            ephemeral=True
+        )
+        await log_event(f"Entrant export sent for giveaway [{gid}] to {interaction.user.name}.")
+
     @discord.ui.button(label="Debug", style=discord.ButtonStyle.gray, custom_id="debug_btn")
+    @timed("GiveawayEndedView.debug")
     async def debug(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
-            footer = interaction.message.embeds[0].footer.text
-            gid = footer.split("Giveaway ID: ")[1].strip()
+            gid = resolve_giveaway_id(None, interaction)
         except:
             return await interaction.response.send_message("ID not found in footer.", ephemeral=True)
 
-        doc = giveaways_col.find_one({"_id": gid})
-        hex_hash = doc.get('final_hash', '0')
-        entrants_count = len(doc.get('entrants', []))
-        winner_idx = int(hex_hash, 16) % entrants_count if entrants_count > 0 else 0
+        doc = await store.get_giveaway(gid)
+        hex_hash = doc.get('final_hash') or '0'
+        seed = doc.get('seed') or 'N/A'
+        entrants_count = doc.get('total_weight', 0)
+        winners = doc.get('winners', [])
         latency = round(self.bot.latency * 1000, 2)
-        db_ping = cluster.admin.command('ping')['ok']
-        process_time = time.process_time()
-        drift = round(time.time() % 1, 4)
+        start = time.perf_counter()
+        try:
+            await store.ping()
+            db_ping = f"{round((time.perf_counter() - start) * 1000, 2)}ms"
+        except Exception:
+            db_ping = "UNREACHABLE"
+        process_time = round(time.process_time(), 2)
         pid = os.getpid()
 
+        def p99(name):
+            # histogram bucket bound, so this is an upper estimate
+            value = metrics.quantile(name, 0.99)
+            if value is None:
+                return "N/A"
+            if value == float("inf"):
+                return f">{metrics.buckets[-1]:g}s"
+            return f"<={value * 1000:g}ms" if value < 1 else f"<={value:g}s"
+
+        draws = metrics.count("entropy_draws_total")
+        fallback_rate = f"{metrics.count('entropy_draws_total', source='secrets') / draws:.1%}" if draws else "N/A"
+
         embed = discord.Embed(title="Debug Menu", color=0x2f3136)
-        embed.add_field(name="CORE_IDENTITY", value=f"```ID: {gid}\nCID: {interaction.channel_id}```", inline=False)
-        embed.add_field(name="CRYPTO_SIG", value=f"```HASH: {hex_hash}\nALGO: SHA-256\nSALT: NS_TIMESTAMP```", inline=False)
-        embed.add_field(name="LATENCY_METRICS", value=f"```GATEWAY: {latency}ms\nDB_NODE: {db_ping}\nAPI_SRC: RANDOM.ORG_L3```", inline=True)
-        embed.add_field(name="ARRAY_DATA", value=f"```ENTRANTS: {entrants_count}\nWIN_IDX: {winner_idx}```", inline=True)
-        embed.add_field(name="SYSTEM_RESOURCES", value=f"```PID: {pid}\nCPU_TIME: {process_time}s\nMEM_STATE: VIRT_ALLOC```", inline=True)
-        embed.add_field(name="NETWORK_OSI", value=f"```EXEC_DRIFT: {drift}s\nMOD_DIVISOR: {entrants_count}\nBIT_STR: 256-bit```", inline=True)
+        embed.add_field(name="CORE_IDENTITY", value=f"```ID: {gid}\nCID: {interaction.channel_id}\nSTORE: {'ARCHIVE' if doc.get('archived_at') else 'HOT'}```", inline=False)
+        embed.add_field(name="CRYPTO_SIG", value=f"```HASH: {hex_hash}\nSEED: {seed}\nALGO: SHA-256 / FENWICK\nDRAWS: {len(doc.get('draws', []))}```", inline=False)
+        embed.add_field(name="LATENCY_METRICS", value=f"```GATEWAY: {latency}ms\nDB_PING: {db_ping}\nDB_P99: {p99('mongo_op_seconds')}\nLOOP_LAG_P99: {p99('event_loop_lag_seconds')}```", inline=True)
+        embed.add_field(name="ARRAY_DATA", value=f"```ENTRANTS: {entrants_count}\nUNIQUE: {doc.get('entry_count', 0)}\nWINNERS: {len(winners)}```", inline=True)
+        embed.add_field(name="SYSTEM_RESOURCES", value=f"```PID: {pid}\nCPU_TIME: {process_time}s\nRSS: {rss_bytes() / 2**20:.1f}MB```", inline=True)
+        embed.add_field(name="ENTROPY", value=f"```SOURCE: {entropy.status()}\nDRAWS: {draws}\nFALLBACK_RATE: {fallback_rate}```", inline=True)
+        embed.add_field(name="QUEUES", value=f"```SCHEDULED: {len(self.bot.scheduler.deadlines)}\nENDING: {len(self.bot.pipeline.in_flight)}\nEND_LATENESS_P99: {p99('scheduler_lateness_seconds')}\nREST_QUEUED: {len(dispatcher.heap)}\nLOG_QUEUED: {log_pipeline.queue.qsize()}```", inline=True)
+        cache_stats = store.cache.stats()
+        embed.add_field(name="CACHE", value=f"```HITS: {cache_stats['hits']}\nMISSES: {cache_stats['misses']}\nHIT_RATE: {cache_stats['hit_rate']}\nSIZE: {cache_stats['giveaways']}/{cache_stats['indexed_entrants']}```", inline=True)
         await interaction.response.send_message(embed=embed, ephemeral=True)
         
     @discord.ui.button(label="Reroll", style=discord.ButtonStyle.red, custom_id="reroll_btn", emoji="🎲")
+    @timed("GiveawayEndedView.reroll")
     async def reroll(self, interaction: discord.Interaction, button: discord.ui.Button):
-        gid = self.giveaway_id
-        if not gid:
-            try:
-                footer_text = interaction.message.embeds[0].footer.text
-                gid = footer_text.split("Giveaway ID: ")[1].strip()
-            except:
-                return await interaction.response.send_message("Could not find Giveaway ID.", ephemeral=True)
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
+            return await interaction.response.send_message("Could not find Giveaway ID.", ephemeral=True)
         
-        g = giveaways_col.find_one({"_id": gid})
+        g = await store.get_giveaway(gid)
         if not g:
             return await interaction.response.send_message("Giveaway not found.", ephemeral=True)
 
@@ -254,58 +2215,57 @@ class GiveawayEndedView(discord.ui.View):
         await interaction.response.defer(ephemeral=True)
         await log_event(f"Reroll initiated by <@{interaction.user.name}> for giveaway [{g['title']}] with ID [{g['_id']}]")
 
-        entrants = g.get("entrants", [])
+        entrants = sorted((await store.get_entrants(gid)).items()) if g.get("total_weight", 0) > 0 else []
+        excluded = g.get("past_winners", [])
         
         if not entrants:
             await log_event(f"No entrants found for giveaway [{g['title']}] with ID [{g['_id']}]")
             return await interaction.followup.send("No entrants found.", ephemeral=True)
         
         try:
-            await log_event("Attempting to fetch Random.org API...")
-            try:
-                res = requests.get("https://www.random.org/integers/?num=1&min=1&max=100&col=1&base=10&format=plain&rnd=new", timeout=5)
-                api_val = int(res.text.strip())
-                await log_event("Random.org API fetched successfully and result has been generated.")
-            except Exception as e:
-                api_val = secrets.randbelow(100)
-                await log_event(f"Error with API: {e}. Resorting to standard randomization.")
+            seed, source = await make_seed(gid)
+            if source == "random.org":
+                await log_event("Random.org value taken from buffer and result has been generated.")
+            else:
+                await log_event(f"Random.org unavailable ({entropy.status()}). Resorting to standard randomization.")
 
             await log_event("Attempting randomization...")
-            seed = f"{api_val}{time.time_ns()}".encode()
-            hex_hash = hashlib.sha256(seed).hexdigest()
-            winner_idx = int(hex_hash, 16) % len(entrants)
-            winner_id = entrants[winner_idx]
+            winners = await asyncio.to_thread(draw_winners, entrants, seed, g.get("winners_count", 1), excluded)
+            if not winners:
+                await log_event(f"No eligible entrants left to reroll for giveaway [{g['title']}] with ID [{gid}]")
+                return await interaction.followup.send("Every entrant has already won.", ephemeral=True)
+            short_hash = seed[:12].upper()
+            await store.update_ended(gid, {
+                "$set": {"winners": winners, "seed": seed, "final_hash": short_hash},
+                "$push": {"draws": {"seed": seed, "winners": winners, "excluded": excluded}},
+                "$addToSet": {"past_winners": {"$each": winners}}
+            })
             await log_event("Randomization success.")
 
+            stale = [interaction.message]
+            async for msg in interaction.channel.history(limit=3):
+                if msg.author == self.bot.user and msg.content.startswith("<@"):
+                    stale.append(msg)
+                    break
             try:
-                await interaction.message.delete()
+                await purge(interaction.channel, stale)
             except:
                 pass
 
-            await asyncio.sleep(0.5)
-
-            async for msg in interaction.channel.history(limit=3):
-                if msg.author == self.bot.user and msg.content.startswith("<@"):
-                    try:
-                        await msg.delete()
-                        break
-                    except:
-                        pass
-
             await log_event("Creating reroll embed...")
             win_embed = discord.Embed(
                 title="REROLLED RESULTS 🔄",
-                description=f"**New Winner 🎉**: <@{winner_id}>\n**Rerolled By**: **{interaction.user.mention}**\n//////////////////////////////////////////////////",
+                description=f"**{'New Winners' if len(winners) > 1 else 'New Winner'} 🎉**: {mention_list(winners)}\n**Rerolled By**: **{interaction.user.mention}**\n//////////////////////////////////////////////////",
                 color=0xe74c3c
             )
             await log_event("Fetching hash...")
-            short_hash = hex_hash[:12].upper()
             win_embed.set_image(url="https://i.imgur.com/iM8ByUz.png")
             win_embed.set_footer(text=f"Hash: {short_hash} | Giveaway ID: {gid}")
             
-            await interaction.channel.send(embed=win_embed, view=GiveawayEndedView(self.bot, entrants, g["title"], gid, hash_val=short_hash))
-            await asyncio.sleep(1)
-            await interaction.channel.send(f"<@{winner_id}>")
+            route = f"send:{interaction.channel_id}"
+            view = GiveawayEndedView(self.bot, g["title"], gid, hash_val=short_hash)
+            await dispatcher.send(route, PRIORITY_ANNOUNCE, partial(interaction.channel.send, embed=win_embed, view=view))
+            await dispatcher.send(route, PRIORITY_ANNOUNCE, partial(interaction.channel.send, " ".join(f"<@{uid}>" for uid in winners)))
             await log_event("Message sent successfully.")
             await interaction.followup.send("Reroll complete.", ephemeral=True)
         except Exception as e:
@@ -318,127 +2278,117 @@ class GiveawayView(discord.ui.View):
         self.giveaway_id = giveaway_id
             
     @discord.ui.button(label="View Entrants", style=discord.ButtonStyle.gray, custom_id="view_btn")
+    @timed("GiveawayView.view_list")
     async def view_list(self, interaction: discord.Interaction, button: discord.ui.Button):
-        gid = self.giveaway_id
-        if not gid:
-            try:
-                footer = interaction.message.embeds[0].footer.text
-                gid = footer.split("Giveaway ID: ")[1].strip()
-            except:
-                return await interaction.response.send_message("Could not resolve Giveaway ID", ephemeral=True)
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
+            return await interaction.response.send_message("Could not resolve Giveaway ID", ephemeral=True)
 
-        doc = giveaways_col.find_one({"_id": gid})
-        if not doc or not doc["entrants"]:
+        doc = await store.get_giveaway(gid)
+        if not doc or not doc.get("total_weight"):
             return await interaction.response.send_message("No entries yet.", ephemeral=True)
 
-        unique_entrants = list(set(doc["entrants"]))
-        entry_lines = []
-        for uid in unique_entrants:
-            count = doc["entrants"].count(uid)
-            multiplier_text = f" (x{count})" if count > 1 else ""
-            entry_lines.append(f"• <@{uid}>{multiplier_text}")
-
-        embed = discord.Embed(title="Current Entrants", description="\n".join(entry_lines), color=0x3498db)
-        embed.set_footer(text=f"Total entrants: {len(doc['entrants'])}")
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        view = EntrantsPageView(gid, "Current Entrants", "Total entrants")
+        await interaction.response.send_message(embed=await view.render(), view=view, ephemeral=True)
 
     @discord.ui.button(label="Enter Giveaway", style=discord.ButtonStyle.green, custom_id="enter_btn", emoji="🎉")
+    @timed("GiveawayView.enter")
     async def enter(self, interaction: discord.Interaction, button: discord.ui.Button):
         await log_event(f"User <@{interaction.user.name}> attempting to enter giveaway...")
-        gid = self.giveaway_id
-        if not gid:
-            try:
-                footer = interaction.message.embeds[0].footer.text
-                gid = footer.split("Giveaway ID: ")[1].strip()
-            except:
-                return await interaction.response.send_message("Error: Could not resolve Giveaway ID", ephemeral=True)
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
+            return await interaction.response.send_message("Error: Could not resolve Giveaway ID", ephemeral=True)
 
-        doc = giveaways_col.find_one({"_id": gid})
-        if not doc:
-            return await interaction.response.send_message("Data not found.", ephemeral=True)
+        multiplier, refusal = await role_rules.evaluate(interaction.user)
+        if refusal:
+            return await interaction.response.send_message(refusal, ephemeral=True)
+        luck_text = f" with x{multiplier} luck" if multiplier > 1 else ""
 
-        if interaction.user.id in doc["entrants"]:
+        result = await (entry_buffer or store).enter(gid, interaction.user.id, multiplier)
+        if result == "missing":
+            return await interaction.response.send_message("Data not found.", ephemeral=True)
+        if result == "already":
             return await interaction.response.send_message("You are already in!", ephemeral=True)
 
-        multiplier = 1
-        luck_text = ""
-        role_names = [role.name for role in interaction.user.roles]
-        if "🏆 x3 Entries" in role_names:
-            multiplier = 3
-            luck_text = " with x3 luck"
-        elif "🏆 x2 Entries" in role_names:
-            multiplier = 2
-            luck_text = " with x2 luck"
-
-        entry_list = [interaction.user.id] * multiplier
-        giveaways_col.update_one({"_id": gid}, {"$push": {"entrants": {"$each": entry_list}}})
         await interaction.response.send_message(f"You have entered the giveaway{luck_text}!", ephemeral=True)
+        live_counter.mark(gid, interaction.channel_id)
         await log_event(f"User {interaction.user.name} entered giveaway {gid}.")
 
     @discord.ui.button(label="Leave Giveaway", style=discord.ButtonStyle.red, custom_id="leave_btn")
+    @timed("GiveawayView.leave")
     async def leave(self, interaction: discord.Interaction, button: discord.ui.Button):
-        gid = self.giveaway_id
-        if not gid:
-            try:
-                gid = interaction.message.embeds[0].footer.text.split("Giveaway ID: ")[1].strip()
-            except:
-                return await interaction.response.send_message("ID not found.", ephemeral=True)
+        try:
+            gid = resolve_giveaway_id(self.giveaway_id, interaction)
+        except:
+            return await interaction.response.send_message("ID not found.", ephemeral=True)
 
-        doc = giveaways_col.find_one({"_id": gid})
-        if not doc:
+        result = await (entry_buffer or store).leave(gid, interaction.user.id)
+        if result == "missing":
             return await interaction.response.send_message("Giveaway not found.", ephemeral=True)
-
-        if interaction.user.id not in doc["entrants"]:
+        if result == "not_joined":
             return await interaction.response.send_message("You haven't joined this giveaway!", ephemeral=True)
 
-        giveaways_col.update_one(
-            {"_id": gid},
-            {"$pull": {"entrants": interaction.user.id}}
-        )
-
         await interaction.response.send_message("Left the giveaway successfully!", ephemeral=True)
+        live_counter.mark(gid, interaction.channel_id)
         await log_event(f"User {interaction.user.name} left giveaway {gid}.")
 
 #################################
 
-@bot.tree.command(name="creategiveaway", description="Setup a giveaway.")
-@app_commands.default_permissions(administrator=True, manage_webhooks=True)
-async def creategiveaway(interaction: discord.Interaction, title: str, description: str, hours: float, is_final: str = "n"):
-    giveaway_id = str(interaction.id)
-    is_final_bool = is_final.lower() == "y"
-
-    start_time = datetime.now(timezone.utc).timestamp()
-    end_timestamp = start_time + (hours * 3600)
-    
-    if is_final_bool:
-        embed_title = f"FINAL GIVEAWAY: 🎉 {title} 🎉"
+def build_giveaway_embed(doc, entry_count=0, total_weight=0):
+    end_timestamp = to_timestamp(doc["end_time"])
+    if doc.get("is_final"):
+        embed_title = f"FINAL GIVEAWAY: 🎉 {doc['title']} 🎉"
         embed_color = 0xf1c40f
         image_url = "https://i.imgur.com/qnLmBhj.png"
     else:
-        embed_title = f"GIVEAWAY: 🎉 {title} 🎉"
+        embed_title = f"GIVEAWAY: 🎉 {doc['title']} 🎉"
         embed_color = 0x3498db
         image_url = "https://i.imgur.com/qm7sTPg.png"
     
     embed = discord.Embed(
         title=embed_title,
-        description=f"{description}\n\n**Ends:** <t:{int(end_timestamp)}:R>",
+        description=f"{doc['description']}\n\n**Ends:** <t:{int(end_timestamp)}:R>",
         color=embed_color
     )
+    embed.add_field(name="Entrants", value=str(entry_count), inline=True)
+    embed.add_field(name="Entries", value=str(total_weight), inline=True)
+    if doc.get("winners_count", 1) > 1:
+        embed.add_field(name="Winners", value=str(doc["winners_count"]), inline=True)
     embed.set_image(url=image_url)
-    embed.set_footer(text=f"Giveaway ID: {giveaway_id}")
+    embed.set_footer(text=f"Giveaway ID: {doc['_id']}")
+    return embed
 
-    await interaction.response.send_message(embed=embed, view=GiveawayView(giveaway_id))
-    
-    msg = await interaction.original_response()
-    giveaways_col.insert_one({
+@bot.tree.command(name="creategiveaway", description="Setup a giveaway.")
+@app_commands.default_permissions(administrator=True, manage_webhooks=True)
+@timed("creategiveaway")
+async def creategiveaway(interaction: discord.Interaction, title: str, description: str, hours: float, is_final: str = "n", winners: app_commands.Range[int, 1, 50] = 1):
+    giveaway_id = str(interaction.id)
+    is_final_bool = is_final.lower() == "y"
+
+    start_time = datetime.now(timezone.utc).timestamp()
+    end_timestamp = start_time + (hours * 3600)
+
+    g = {
         "_id": giveaway_id,
-        "message_id": msg.id,
         "title": title,
+        "description": description,
         "channel_id": interaction.channel_id,
-        "entrants": [],
+        "guild_id": interaction.guild_id,
+        "entry_count": 0,
+        "total_weight": 0,
+        "winners_count": winners,
         "end_time": datetime.fromtimestamp(end_timestamp, tz=timezone.utc),
         "is_final": is_final_bool
-    })
+    }
+
+    await interaction.response.send_message(embed=build_giveaway_embed(g), view=GiveawayView(giveaway_id))
+    
+    msg = await interaction.original_response()
+    g["message_id"] = msg.id
+    await store.insert_one(g)
+    bot.scheduler.schedule(giveaway_id, end_timestamp, interaction.channel_id)
     
     await log_event(f"Giveaway successfully created with title [{title}] and ID [{giveaway_id}]. Mode: {is_final_bool}")
 
@@ -446,27 +2396,70 @@ async def creategiveaway(interaction: discord.Interaction, title: str, descripti
 
 @bot.tree.command(name="testfill", description="Fill a giveaway with 5 fake entrants.")
 @app_commands.default_permissions(administrator=True, manage_webhooks=True)
+@timed("testfill")
 async def testfill(interaction: discord.Interaction, giveaway_id: str):
-    g = giveaways_col.find_one({"_id": giveaway_id})
+    g = await store.get_giveaway(giveaway_id)
     if not g:
         return await interaction.response.send_message("Giveaway not found.", ephemeral=True)
         
     fake_ids = [111111111111111111, 222222222222222222, 333333333333333333, 444444444444444444, 555555555555555555]
-    giveaways_col.update_one({"_id": giveaway_id}, {"$push": {"entrants": {"$each": fake_ids}}})
+    await store.add_entrants({giveaway_id: {uid: 1 for uid in fake_ids}})
+    live_counter.mark(giveaway_id, g["channel_id"])
     await interaction.response.send_message(f"Added 5 fake people to giveaway `{giveaway_id}`!", ephemeral=True)
     await log_event(f"Giveaway {giveaway_id} filled with 5 fake users.")
 
 ##########################################
 
+@bot.tree.command(name="giveawayroles", description="Entry role rules: Weight/Require/Block/Delete/Show (W/R/B/D/S).")
+@app_commands.default_permissions(administrator=True, manage_webhooks=True)
+@timed("giveawayroles")
+async def giveawayroles(interaction: discord.Interaction, action: str, role: discord.Role = None, weight: app_commands.Range[int, 1, 100] = 2):
+    action = action.lower()
+
+    if action not in ["w", "r", "b", "d", "s"]:
+        return await interaction.response.send_message("Invalid argument || Use W (weight), R (require), B (block), D (delete) or S (show).", ephemeral=True)
+    if action != "s" and role is None:
+        return await interaction.response.send_message("A role is required for this action.", ephemeral=True)
+
+    guild_id = interaction.guild_id
+    if action == "w":
+        await store.update_guild_rules(guild_id, {"$set": {f"weights.{role.id}": weight}})
+        message = f"{role.mention} now enters with x{weight} weight."
+    elif action == "r":
+        await store.update_guild_rules(guild_id, {"$addToSet": {"required": role.id}, "$pull": {"blocked": role.id}})
+        message = f"{role.mention} added to the required roles."
+    elif action == "b":
+        await store.update_guild_rules(guild_id, {"$addToSet": {"blocked": role.id}, "$pull": {"required": role.id}})
+        message = f"{role.mention} is now blocked from entering."
+    elif action == "d":
+        await store.update_guild_rules(guild_id, {"$unset": {f"weights.{role.id}": ""}, "$pull": {"required": role.id, "blocked": role.id}})
+        message = f"{role.mention} removed from the entry rules."
+
+    if action != "s":
+        role_rules.invalidate(guild_id)
+        await log_event(f"Entry rules for guild [{guild_id}] changed by <@{interaction.user.name}>: {action.upper()} {role.name}")
+        return await interaction.response.send_message(message, ephemeral=True)
+
+    rules = await role_rules.get(interaction.guild)
+    lines = [f"<@&{r}>: x{w}" for r, w in sorted(rules["weights"].items(), key=lambda item: -item[1])]
+    embed = discord.Embed(title="Entry Rules" + (" (legacy role names)" if rules["legacy"] else ""), color=0x3498db)
+    embed.add_field(name="Weights", value="\n".join(lines) or "None", inline=False)
+    embed.add_field(name="Required (any of)", value=" ".join(f"<@&{r}>" for r in rules["required"]) or "None", inline=False)
+    embed.add_field(name="Blocked", value=" ".join(f"<@&{r}>" for r in rules["blocked"]) or "None", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+##########################################
+
 @bot.tree.command(name="cancelgiveaway", description="Cancel or End the giveaway (C/E).")
 @app_commands.default_permissions(administrator=True, manage_webhooks=True)
+@timed("cancelgiveaway")
 async def cancelgiveaway(interaction: discord.Interaction, giveaway_id: str, action: str):
     action = action.lower()
 
     if action not in ["e", "c"]:
         return await interaction.response.send_message("Invalid argument || Use E to end and C to cancel.", ephemeral=True)
 
-    doc = giveaways_col.find_one({"_id": giveaway_id})
+    doc = await store.get_giveaway(giveaway_id)
     if not doc:
         return await interaction.response.send_message("Giveaway not found.", ephemeral=True)
     giveaway_title = doc["title"]
@@ -475,16 +2468,22 @@ async def cancelgiveaway(interaction: discord.Interaction, giveaway_id: str, act
         await interaction.response.send_message(f"**__Cancelling Giveaway__**\n\n- Title: {giveaway_title}\n- ID: {giveaway_id}")
         try:
             channel = bot.get_channel(doc["channel_id"])
-            msg = await channel.fetch_message(doc["message_id"])
-            await msg.delete()
+            msg = channel.get_partial_message(doc["message_id"])
+            await dispatcher.send(f"delete:{channel.id}", PRIORITY_DELETE, msg.delete)
         except:
             pass
         
-        giveaways_col.delete_one({"_id": giveaway_id})
+        await store.delete_one({"_id": giveaway_id})
+        await store.delete_entrants(giveaway_id)
+        await store.delete_archived(giveaway_id)
+        remove_export(giveaway_id)
+        bot.scheduler.cancel(giveaway_id)
         await log_event(f"Giveaway {giveaway_id} cancelled and purged.")
 
     elif action == "e":
-        giveaways_col.update_one({"_id": giveaway_id}, {"$set": {"end_time": datetime.now(timezone.utc)}})
+        now = datetime.now(timezone.utc)
+        await store.update_one({"_id": giveaway_id}, {"$set": {"end_time": now}})
+        bot.scheduler.schedule(giveaway_id, now, doc["channel_id"])
         await interaction.response.send_message(f"**__Force Ending Giveaway__**\n\n- Title: {giveaway_title}\n- ID: {giveaway_id}")
         await log_event(f"Giveaway {giveaway_id} force-ended.")
 
@@ -492,6 +2491,7 @@ async def cancelgiveaway(interaction: discord.Interaction, giveaway_id: str, act
 
 @bot.tree.command(name="shutdown", description="Emergency Stop (DEV ONLY))")
 @app_commands.default_permissions(administrator=True, manage_webhooks=True)
+@timed("shutdown")
 async def shutdown(interaction: discord.Interaction):
     if interaction.user.id != int(os.environ.get("DEV_ID")):
         return await interaction.response.send_message("You are not authorized to run this command.", ephemeral=True)